@@ -0,0 +1 @@
+# Lets `pytest` import the top-level modules (utils, snmp_walker, ...) from tests/ without installing the repo
@@ -0,0 +1,85 @@
+# db_pool.py
+import os
+import threading
+from contextlib import contextmanager
+import cx_Oracle
+
+# One process-wide session pool, shared by every insert path and polling cycle
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+_pool_counters = {'acquired': 0, 'released': 0, 'created': 0}
+
+def get_db_pool(db_host, db_port, db_user, db_pass, db_sid):
+    """
+    Return the shared cx_Oracle SessionPool, creating it on first use.
+
+    Pool sizing comes from DB_POOL_MIN (default 1), DB_POOL_MAX (default 4)
+    and DB_POOL_INCREMENT (default 1). Asking for different credentials or
+    another database closes the old pool and opens a new one.
+    """
+    global _pool, _pool_key
+    key = (db_host, str(db_port), db_user, db_sid)
+
+    with _pool_lock:
+        if _pool is not None and _pool_key == key:
+            return _pool
+        if _pool is not None:
+            _pool.close(force=True)
+
+        dsn_tns = cx_Oracle.makedsn(db_host, db_port, sid=db_sid)
+        _pool = cx_Oracle.SessionPool(
+            user=db_user,
+            password=db_pass,
+            dsn=dsn_tns,
+            min=int(os.getenv("DB_POOL_MIN", 1)),
+            max=int(os.getenv("DB_POOL_MAX", 4)),
+            increment=int(os.getenv("DB_POOL_INCREMENT", 1)),
+            threaded=True,
+            getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT
+        )
+        _pool_key = key
+        _pool_counters['created'] += 1
+        print(f"Created Oracle session pool (min={_pool.min}, max={_pool.max}, increment={_pool.increment}).")
+        return _pool
+
+@contextmanager
+def db_connection(db_host, db_port, db_user, db_pass, db_sid):
+    """Borrow a connection from the shared pool; it goes back to the pool on exit (uncommitted work is rolled back)"""
+    pool = get_db_pool(db_host, db_port, db_user, db_pass, db_sid)
+    connection = pool.acquire()
+    _pool_counters['acquired'] += 1
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
+        _pool_counters['released'] += 1
+
+def get_pool_stats():
+    """
+    Snapshot of the shared pool for monitoring.
+
+    Returns:
+        dict: opened/busy sessions and pool sizing as reported by cx_Oracle,
+              plus acquire/release counts and how many pools were created.
+              Only the counters are present if no pool is open.
+    """
+    stats = dict(_pool_counters)
+    if _pool is not None:
+        stats.update({
+            'opened': _pool.opened,
+            'busy': _pool.busy,
+            'min': _pool.min,
+            'max': _pool.max,
+            'increment': _pool.increment,
+        })
+    return stats
+
+def close_db_pool():
+    """Close the shared pool, e.g. when a polling daemon shuts down"""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close(force=True)
+        _pool = None
+        _pool_key = None
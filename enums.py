@@ -1,5 +1,8 @@
 COMPILED_MIBS = 'compiled_mibs'
+PRUNED_MIBS = 'compiled_mibs_pruned'
 MIBS = 'mibs'
+MIB_SNAPSHOT = 'mib_snapshot.pickle'
+ONU_STATE_DIR = 'onu_state'
 
 MAC = 'mac'
 OPERATION_STATUS = 'operation_status'
@@ -1,11 +1,13 @@
-from pysnmp.smi import view
 from pysnmp.hlapi.v3arch.asyncio import *
+import asyncio
+import os
 import time
-from utils import load_mibs
+from utils import get_oid_resolver
 from enums import OCTETSTRING, HEX_STRING, OID, OID_SHORT, GAUGE32, INTEGER, STRING, COUNTER32, COUNTER64, TIMETICKS, IPADDRESS, NULL, CDATA, EPON_LOWER, GPON_LOWER, PON_LOWER
 from oid_dict import oid_dictionary, IFDESCR
 from index_encoder import encode_index_from_string
 from snmp_session import get_snmp_session
+from snmp_walker import walk_oid, TOO_BIG, NO_SUCH_NAME, END_OF_WALK_TYPES
 
 def format_raw_values(value, value_type):
     """
@@ -53,34 +55,42 @@ def format_raw_values(value, value_type):
         return f"{value_type}: {value.prettyPrint()}"
 
 
-def resolve_oid(oid, mib_view):
-    try:
-        oid_obj = ObjectIdentity(oid)
-        oid_obj.resolve_with_mib(mib_view)
-        return oid_obj.prettyPrint()
-    except Exception:
-        try:
-            mib_node = mib_view.get_node_name(oid)
-            module_name = mib_node[0]
-            obj_name = mib_node[1]
-            indices = list(oid[len(mib_view.get_node_oid(mib_node)):])
-            index_str = '.' + '.'.join(map(str, indices)) if indices else ''
-            return f"{module_name}::{obj_name}{index_str}"
-        except Exception:
-            return oid.prettyPrint()
+def resolve_oid(oid, oid_resolver):
+    return oid_resolver.resolve(oid)
 
 
-async def get_olt_information(target_ip, community_string, port, version, retries, timeout, branch, brand, onu_index_str, card_id, all_oid):
+async def get_olt_information(target_ip, community_string, port, version, retries, timeout, branch, brand, onu_index_str, card_id, all_oid, as_records=False, bulk=False):
     """
     Perform an SNMP walk or get operation to retrieve OLT information.
-    Returns all resolved OIDs and values as strings.
+    Returns all resolved OIDs and values as strings, or as VarBindRecords
+    (informational/error messages are then printed instead of returned)
+    when as_records is True. Walks use GETBULK with adaptive max-repetitions
+    on SNMPv2c targets when bulk is True.
     """
     result = []
+
+    def add_varbind(oid, value):
+        if as_records:
+            result.append(oid_resolver.resolve_record(oid, value))
+        else:
+            symbolic_oid = resolve_oid(oid, oid_resolver)
+            formatted_value = format_raw_values(value, type(value).__name__.upper())
+            result.append(f"{symbolic_oid} = {formatted_value}")
+
+    def add_message(message):
+        if as_records:
+            print(message)
+        else:
+            result.append(message)
+
+    def error_result(message):
+        print(message)
+        return [] if as_records else [message]
+
     start_time = time.time()
 
-    # Load MIBs once
-    mib_builder = load_mibs()
-    mib_view = view.MibViewController(mib_builder)
+    # Shared OID resolver, scoped to the brand being queried
+    oid_resolver = get_oid_resolver(brand)
 
     # SNMP Session
     snmp_engine, community, transport, context = await get_snmp_session(
@@ -104,11 +114,11 @@ async def get_olt_information(target_ip, community_string, port, version, retrie
                     object_types_to_fetch.append(ObjectType(ObjectIdentity(oid_to_query_for_branch)))
                 else:
                     msg = f"Info: OID for branch '{current_branch_key}' with brand '{brand}' not found in dictionary. Skipping for index {onu_index_str}."
-                    result.append(msg)
+                    add_message(msg)
             
             if not object_types_to_fetch:
-                if not any(item.startswith("Info:") for item in result): # Add error only if no info messages about skipping were added
-                     result.append(f"Error: No OIDs found to query for brand '{brand}' and index '{onu_index_str}' with all_oid=True.")
+                if not any(isinstance(item, str) and item.startswith("Info:") for item in result): # Add error only if no info messages about skipping were added
+                     add_message(f"Error: No OIDs found to query for brand '{brand}' and index '{onu_index_str}' with all_oid=True.")
                 # No SNMP call needed if nothing to fetch
             else:
                 # Perform a single SNMP GET with all collected ObjectTypes
@@ -121,7 +131,7 @@ async def get_olt_information(target_ip, community_string, port, version, retrie
                 )
 
                 if errorIndication:
-                    result.append(f"Error during bulk SNMP GET: {errorIndication}")
+                    add_message(f"Error during bulk SNMP GET: {errorIndication}")
                 elif errorStatus:
                     failed_oid_str = '?'
                     if errorIndex is not None and 0 < int(errorIndex) <= len(object_types_to_fetch):
@@ -129,24 +139,20 @@ async def get_olt_information(target_ip, community_string, port, version, retrie
                         failed_oid_object = object_types_to_fetch[int(errorIndex) - 1]
                         failed_oid_str = str(failed_oid_object[0]) # Get the OID string from ObjectType
                     
-                    result.append(f"SNMP Error during bulk GET: {errorStatus.prettyPrint()} (at OID like {failed_oid_str}, errorIndex: {errorIndex})")
+                    add_message(f"SNMP Error during bulk GET: {errorStatus.prettyPrint()} (at OID like {failed_oid_str}, errorIndex: {errorIndex})")
                     # Process any varBinds that were successfully retrieved before the error
                     for oid_val, value_val in varBinds:
-                        symbolic_oid = resolve_oid(oid_val, mib_view)
-                        formatted_value = format_raw_values(value_val, type(value_val).__name__.upper())
-                        result.append(f"{symbolic_oid} = {formatted_value}")
+                        add_varbind(oid_val, value_val)
                 else: # Success for all OIDs in the bulk GET
                     for oid_val, value_val in varBinds:
-                        symbolic_oid = resolve_oid(oid_val, mib_view)
-                        formatted_value = format_raw_values(value_val, type(value_val).__name__.upper())
-                        result.append(f"{symbolic_oid} = {formatted_value}")
+                        add_varbind(oid_val, value_val)
         
         else: # Single OID GET (onu_index_str is true, all_oid is false)
             action_description = f"GET for branch '{branch}' (index: {onu_index_str}, brand: {brand})"
             if branch not in oid_dictionary or brand not in oid_dictionary[branch]:
                 error_msg = f"Error: OID for specified branch '{branch}' and brand '{brand}' not found in dictionary."
                 print(f"{action_description} - {error_msg}")
-                result.append(error_msg)
+                add_message(error_msg)
             else:
                 oid_to_query = f'{oid_dictionary[branch][brand]}.{index}'
                 print(f"Starting {action_description}, OID: {oid_to_query}")
@@ -161,14 +167,12 @@ async def get_olt_information(target_ip, community_string, port, version, retrie
                 )
 
                 if errorIndication:
-                    return [f"Error: {errorIndication}"] # Original behavior: return immediately
+                    return error_result(f"Error: {errorIndication}") # Original behavior: return immediately
                 elif errorStatus:
-                    return [f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}"] # Original behavior
+                    return error_result(f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}") # Original behavior
 
                 for oid, value in varBinds:
-                    symbolic_oid = resolve_oid(oid, mib_view)
-                    formatted_value = format_raw_values(value, type(value).__name__.upper())
-                    result.append(f"{symbolic_oid} = {formatted_value}")
+                    add_varbind(oid, value)
     
     else: # SNMP WALK (onu_index_str is False)
         if all_oid:
@@ -180,33 +184,143 @@ async def get_olt_information(target_ip, community_string, port, version, retrie
         if branch not in oid_dictionary or brand not in oid_dictionary[branch]:
             error_msg = f"Error: OID for branch '{branch}' and brand '{brand}' not found in dictionary for walk."
             print(f"{action_description} - {error_msg}")
-            result.append(error_msg)
+            add_message(error_msg)
         else:
             oid_to_walk = oid_dictionary[branch][brand]
             print(f"Starting {action_description}, Base OID: {oid_to_walk}")
             
-            # SNMP walk
-            objects_to_walk = walk_cmd(
+            # SNMP walk (GETBULK on SNMPv2c when bulk is set, GETNEXT otherwise)
+            try:
+                async for oid, value in walk_oid((snmp_engine, community, transport, context), oid_to_walk, bulk):
+                    add_varbind(oid, value)
+            except RuntimeError as e:
+                return error_result(str(e)) # Original behavior
+
+    end_time = time.time()
+    print(f"Elapsed time: {end_time - start_time:.2f} seconds")
+    print(f"SNMP {action_description} completed. Processed {len(result)} entries.")
+    return result
+
+def pack_get_requests(oids, max_varbinds, max_pdu_bytes):
+    """
+    Split OIDs into GET PDUs bounded by a varbind count and an estimated response size.
+
+    Args:
+        oids (list): (key, oid_str) pairs; key identifies the varbind in the result.
+        max_varbinds (int): Maximum varbinds per PDU.
+        max_pdu_bytes (int): Estimated response bytes per PDU (OID plus a typical value).
+
+    Returns:
+        list: Lists of (key, oid_str) pairs, one per PDU.
+    """
+    pdus = []
+    current = []
+    current_bytes = 0
+    for key, oid in oids:
+        # Response varbind: the OID arcs, a value of typical size and BER headers
+        varbind_bytes = len(oid.split('.')) + 40
+        if current and (len(current) >= max_varbinds or current_bytes + varbind_bytes > max_pdu_bytes):
+            pdus.append(current)
+            current = []
+            current_bytes = 0
+        current.append((key, oid))
+        current_bytes += varbind_bytes
+    if current:
+        pdus.append(current)
+    return pdus
+
+
+async def get_onu_information(target_ip, community_string, port, version, retries, timeout, brand, onu_index_strs, card_id,
+                              branches=None, max_varbinds=None, max_pdu_bytes=None, concurrency=None, as_records=False):
+    """
+    GET the oid_dictionary branches of many ONUs without walking the OLT.
+
+    Every interface string is encoded with encode_index_from_string, the
+    (ONU, branch) OIDs are packed into GET PDUs of at most max_varbinds
+    varbinds (SNMP_GET_MAX_VARBINDS, default 40) and about max_pdu_bytes bytes
+    (SNMP_GET_MAX_BYTES, default 1400), and the PDUs are sent concurrently
+    (SNMP_GET_CONCURRENCY, default 4) over the shared session. A PDU the agent
+    answers with tooBig is split in half and resent; on SNMPv1 a PDU failed with
+    noSuchName is resent without the OID the agent named.
+
+    Args:
+        onu_index_strs (list): Interface strings, e.g. expand_interface_strings("gpon0/2/4/1..64").
+        branches (list): oid_dictionary branches to query; all of the brand's if None.
+
+    Returns:
+        dict: {interface_string: {branch: line}}, where line is a resolved
+              "MODULE::obj.idx = TYPE: value" string, or a VarBindRecord when
+              as_records is True. ONUs or branches the agent does not know are
+              left out; interface strings that cannot be encoded are reported
+              and skipped.
+    """
+    max_varbinds = int(max_varbinds or os.getenv("SNMP_GET_MAX_VARBINDS", 40))
+    max_pdu_bytes = int(max_pdu_bytes or os.getenv("SNMP_GET_MAX_BYTES", 1400))
+    concurrency = int(concurrency or os.getenv("SNMP_GET_CONCURRENCY", 4))
+    if branches is None:
+        branches = [branch for branch, brand_map in oid_dictionary.items() if brand in brand_map]
+
+    start_time = time.time()
+    oid_resolver = get_oid_resolver(brand)
+    snmp_engine, community, transport, context = await get_snmp_session(
+        target_ip, port, community_string, version, timeout, retries
+    )
+
+    result = {}
+    oids = []
+    for onu_index_str in onu_index_strs:
+        try:
+            index = encode_index_from_string(onu_index_str, brand, card_id)
+        except ValueError as e:
+            print(f"Error: {e}")
+            continue
+        result[onu_index_str] = {}
+        for branch in branches:
+            if brand in oid_dictionary.get(branch, {}):
+                oids.append(((onu_index_str, branch), f'{oid_dictionary[branch][brand]}.{index}'))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    pdu_count = 0
+
+    async def send_pdu(pdu):
+        nonlocal pdu_count
+        async with semaphore:
+            pdu_count += 1
+            errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
                 snmp_engine,
                 community,
                 transport,
                 context,
-                ObjectType(ObjectIdentity(oid_to_walk)),
-                lexicographicMode=False
+                *[ObjectType(ObjectIdentity(oid)) for _, oid in pdu],
+                lookupMib=False
             )
+        if errorIndication:
+            print(f"Error during batched SNMP GET: {errorIndication}")
+            return
+        if errorStatus:
+            if int(errorStatus) == TOO_BIG and len(pdu) > 1:
+                half = len(pdu) // 2
+                await asyncio.gather(send_pdu(pdu[:half]), send_pdu(pdu[half:]))
+            elif int(errorStatus) == NO_SUCH_NAME and errorIndex and int(errorIndex) <= len(pdu):
+                # SNMPv1 fails the whole PDU for one unknown instance: drop that OID and resend the rest
+                rest = pdu[:int(errorIndex) - 1] + pdu[int(errorIndex):]
+                if rest:
+                    await send_pdu(rest)
+            else:
+                print(f"SNMP Error during batched GET: {errorStatus.prettyPrint()} (errorIndex: {errorIndex})")
+            return
+        for (key, _), (oid_val, value) in zip(pdu, varBinds):
+            if isinstance(value, END_OF_WALK_TYPES):
+                continue
+            onu_index_str, branch = key
+            if as_records:
+                result[onu_index_str][branch] = oid_resolver.resolve_record(oid_val, value)
+            else:
+                symbolic_oid = resolve_oid(oid_val, oid_resolver)
+                result[onu_index_str][branch] = f"{symbolic_oid} = {format_raw_values(value, type(value).__name__.upper())}"
 
-            async for errorIndication, errorStatus, errorIndex, varBinds in objects_to_walk:
-                if errorIndication:
-                    return [f"Error: {errorIndication}"] # Original behavior
-                elif errorStatus:
-                    return [f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}"] # Original behavior
-                else:
-                    for oid, value in varBinds:
-                        symbolic_oid = resolve_oid(oid, mib_view)
-                        formatted_value = format_raw_values(value, type(value).__name__.upper())
-                        result.append(f"{symbolic_oid} = {formatted_value}")
+    await asyncio.gather(*[send_pdu(pdu) for pdu in pack_get_requests(oids, max_varbinds, max_pdu_bytes)])
 
-    end_time = time.time()
-    print(f"Elapsed time: {end_time - start_time:.2f} seconds")
-    print(f"SNMP {action_description} completed. Processed {len(result)} entries.")
-    return result
\ No newline at end of file
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
+    print(f"Batched GET completed. {len(oids)} OIDs for {len(result)} ONUs in {pdu_count} PDUs.")
+    return result
@@ -131,4 +131,31 @@ def encode_index_from_string(interface_string: str, brand, card_id) -> int:
             return encode_cdata_gpon_index(slot_id, card_id, pon_id, onu_id)
     else:
         # This case should ideally be caught by _parse_interface_string's regex
-        raise ValueError(f"Unknown interface type: {type_str}")
\ No newline at end of file
+        raise ValueError(f"Unknown interface type: {type_str}")
+
+def expand_interface_strings(interface_spec: str) -> list:
+    """
+    Expands a comma separated list of interface strings, where the ONU ID of
+    each may be a range, into single interface strings.
+
+    Args:
+        interface_spec (str): e.g. "gpon0/2/4/1..64" or "epon0/0/1/3,epon0/0/2/1..8".
+
+    Returns:
+        list: Interface strings, e.g. ["gpon0/2/4/1", ..., "gpon0/2/4/64"].
+    Raises:
+        ValueError: if a part is not a valid interface string or range.
+    """
+    interface_strings = []
+    for part in interface_spec.split(','):
+        part = part.strip()
+        match = re.match(r"^((?:epon|gpon)\d+/\d+/\d+/)(\d+)\.\.(\d+)$", part)
+        if match:
+            prefix, first, last = match.group(1), int(match.group(2)), int(match.group(3))
+            if first > last:
+                raise ValueError(f"Invalid ONU range in {part}: {first} > {last}.")
+            interface_strings.extend(f"{prefix}{onu_id}" for onu_id in range(first, last + 1))
+        else:
+            _parse_interface_string(part)
+            interface_strings.append(part)
+    return interface_strings
@@ -0,0 +1,291 @@
+import argparse
+import re
+import time
+from enums import CDATA_GPON, VSOL_GPON
+
+# Regex to remove ANSI escape and cursor codes
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# CDATA: MAC, VLAN, Sport, Port, ONU, Gemid, MAC-Type on one line
+CDATA_ROW = re.compile(
+    r"\s*((?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2})\s+"  # MAC
+    r"(\d+)\s+"                                      # VLAN
+    r"(?:-|\d+)\s+"                                  # Sport
+    r"(\S+)\s+"                                      # Port
+    r"(-|\d+)\s+"                                    # ONU
+    r"(?:-|\d+)\s+"                                  # Gemid
+    r"(?:dynamic|static)"                            # MAC-Type
+)
+
+# The same row anywhere in a whole output: a line starts after \n or a bare \r
+# (page redraw), and fields are separated by whitespace other than line breaks
+CDATA_ROWS = re.compile(
+    r"(?:^|(?<=\r))[^\S\r\n]*((?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2})[^\S\r\n]+"
+    r"(\d+)[^\S\r\n]+(?:-|\d+)[^\S\r\n]+(\S+)[^\S\r\n]+(-|\d+)[^\S\r\n]+(?:-|\d+)[^\S\r\n]+(?:dynamic|static)",
+    re.MULTILINE
+)
+
+# VSOL: MAC, VLAN, Type, Port, two counters and a status, wrapped over several lines
+VSOL_MAC = re.compile(r'[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}$', re.IGNORECASE)
+VSOL_ROW_START = re.compile(r'(?:^|(?<=\r))[^\S\r\n]*[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}(?=\s|$)', re.IGNORECASE | re.MULTILINE)
+VSOL_WORD = re.compile(r'\w+$')
+VSOL_PORT = re.compile(r'\w+(\d+)/(\d+):(\d+)')
+VSOL_FIELDS = 7
+
+# Vendors whose MAC table these parsers understand
+SUPPORTED_VENDORS = (CDATA_GPON, VSOL_GPON)
+
+
+def _cdata_entry(line):
+    match = CDATA_ROW.match(line)
+    if match is None:
+        return None
+    mac, vlan, port, onu = match.groups()
+    return {
+        "MAC": mac,
+        "VLAN": int(vlan),
+        "Port": f"{port}/{onu}" if onu != "-" else port
+    }
+
+
+def _vsol_entry(fields):
+    # Same shape as the old combined-line regex: mac vlan word port digits digits word
+    if (len(fields) != VSOL_FIELDS or not fields[1].isdecimal() or not fields[4].isdecimal()
+            or not fields[5].isdecimal() or not VSOL_WORD.match(fields[2]) or not VSOL_WORD.match(fields[6])):
+        return None
+    clean_mac = fields[0].replace('.', '').upper()
+    port = fields[3]
+    port_match = VSOL_PORT.match(port)
+    if port_match:
+        port = "/".join(port_match.groups())
+    return {
+        'MAC': f"{clean_mac[0:2]}:{clean_mac[2:4]}:{clean_mac[4:6]}:{clean_mac[6:8]}:{clean_mac[8:10]}:{clean_mac[10:12]}",
+        'VLAN': int(fields[1]),
+        'Port': port
+    }
+
+
+class MacTableParser:
+    """
+    Single-pass MAC-table parser fed one output line at a time.
+
+    CDATA rows are parsed as soon as their line arrives. VSOL rows wrap over
+    several lines, so the parser keeps the whitespace-separated fields of the
+    current row and emits it when the next row's MAC (or close()) shows it is
+    complete. Lines before the first MAC, such as the header, are ignored.
+    """
+
+    def __init__(self, vendor):
+        if vendor not in SUPPORTED_VENDORS:
+            raise ValueError(f"Unsupported vendor: {vendor}")
+        self.vendor = vendor
+        self._fields = None
+
+    def feed(self, line):
+        """Parse one line and return the entries it completes"""
+        if '\x1b' in line:
+            line = ANSI_ESCAPE.sub('', line)
+        if self.vendor == CDATA_GPON:
+            entry = _cdata_entry(line)
+            return [entry] if entry else []
+
+        fields = line.split()
+        if not fields:
+            return []
+        if VSOL_MAC.match(fields[0]):
+            entries = self.close()
+            self._fields = fields
+            return entries
+        if self._fields is not None:
+            self._fields.extend(fields)
+        return []
+
+    def close(self):
+        """Return the entry still pending at the end of the output"""
+        if self._fields is None:
+            return []
+        entry = _vsol_entry(self._fields)
+        self._fields = None
+        return [entry] if entry else []
+
+
+def parse_mac_table(text, vendor):
+    """
+    Parse a whole MAC-table output in one pass.
+
+    Gives the same entries as feeding every line to MacTableParser, but finds
+    the rows with one finditer over the text instead of a call per line.
+
+    Args:
+        text (str): Command output, with or without ANSI sequences.
+        vendor (str): CDATA_GPON or VSOL_GPON.
+
+    Returns:
+        list: {'MAC', 'VLAN', 'Port'} dicts in table order.
+    """
+    if '\x1b' in text:
+        text = ANSI_ESCAPE.sub('', text)
+
+    if vendor == CDATA_GPON:
+        return [{
+            "MAC": mac,
+            "VLAN": int(vlan),
+            "Port": f"{port}/{onu}" if onu != "-" else port
+        } for mac, vlan, port, onu in CDATA_ROWS.findall(text)]
+    elif vendor == VSOL_GPON:
+        # Each row runs from its MAC to the next row's MAC
+        starts = [match.start() for match in VSOL_ROW_START.finditer(text)]
+        starts.append(len(text))
+        entries = []
+        for start, end in zip(starts, starts[1:]):
+            entry = _vsol_entry(text[start:end].split())
+            if entry:
+                entries.append(entry)
+        return entries
+    else:
+        raise ValueError(f"Unsupported vendor: {vendor}")
+
+
+def parse_cdata_gpon(text):
+    return parse_mac_table(text, CDATA_GPON)
+
+
+def parse_vsol_gpon(text):
+    return parse_mac_table(text, VSOL_GPON)
+
+
+# ----------------- BENCHMARK -----------------
+
+def synthetic_cdata_table(entries):
+    lines = ["MAC               VLAN  Sport  Port       ONU  Gemid  MAC-Type"]
+    for i in range(entries):
+        onu = str(i % 128) if i % 10 else "-"
+        lines.append(f"{(i >> 16) & 0xff:02X}:1A:2B:{(i >> 8) & 0xff:02X}:{i & 0xff:02X}:3C  {100 + i % 400:<5} -      gpon0/{1 + i % 16:<4} {onu:<4} {i % 4096:<6} dynamic")
+    return "\r\n".join(lines)
+
+
+def synthetic_vsol_table(entries):
+    # Every field on its own line, as the VSOL CLI wraps them on a narrow terminal
+    lines = ["Mac Address     Vlan  Type     Port        Vport  Gemport  Status"]
+    for i in range(entries):
+        lines.extend([f"{i >> 16 & 0xff:02x}1a.{i >> 8 & 0xff:02x}2b.{i & 0xffff:04x}", str(100 + i % 400), "Dynamic",
+                      f"GPON0/{1 + i % 16}:{1 + i % 128}", "1", str(1 + i % 8), "Active"])
+    return "\r\n".join(lines)
+
+
+# The line-by-line parsers telnet.py used before these, kept as the benchmark reference
+
+def _reference_clean_lines(text):
+    cleaned_lines = []
+    for line in text.splitlines():
+        line = ANSI_ESCAPE.sub('', line)
+        line = line.replace('\t', ' ')
+        line = re.sub(r'\s+', ' ', line)
+        cleaned_lines.append(line.strip())
+    return cleaned_lines
+
+
+def _reference_cdata_gpon(text):
+    mac_entries = []
+    lines = text.strip().splitlines()
+    data_lines = [line for line in lines if re.match(r"\s*([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}", line)]
+    for line in data_lines:
+        match = re.match(r"\s*([0-9A-Fa-f:]{17})\s+(\d+)\s+(-|\d+)\s+(\S+)\s+(-|\d+)\s+(-|\d+)\s+(dynamic|static)", line)
+        if match:
+            mac, vlan, sport, port, onu, gemid, mac_type = match.groups()
+            mac_entries.append({
+                "MAC": mac,
+                "VLAN": int(vlan),
+                "Port": f"{port}/{onu}" if onu != "-" else port
+            })
+    return mac_entries
+
+
+def _reference_combined_line(line):
+    match = re.match(r"^([0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4})\s+(\d+)\s+\w+\s+(\S+)\s+\d+\s+\d+\s+\w+$", line, re.IGNORECASE)
+    if match:
+        raw_mac, vlan, raw_port = match.groups()
+        clean_mac = raw_mac.replace('.', '').upper()
+        port = raw_port
+        port_match = re.match(r'\w+(\d+)/(\d+):(\d+)', raw_port)
+        if port_match:
+            port = f"{port_match.group(1)}/{port_match.group(2)}/{port_match.group(3)}"
+        return {
+            'MAC': ':'.join([clean_mac[i:i+2] for i in range(0, 12, 2)]),
+            'VLAN': int(vlan),
+            'Port': port
+        }
+
+
+def _reference_vsol_gpon(text):
+    mac_entries = []
+    combined_line = ''
+    fields_collected = 0
+    for line in _reference_clean_lines(text):
+        if not line:
+            continue
+        if re.match(r'^[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}$', line, re.IGNORECASE):
+            if combined_line and fields_collected >= 6:
+                mac_entries.append(_reference_combined_line(combined_line))
+            combined_line = line
+            fields_collected = 1
+        else:
+            combined_line += f' {line}'
+            fields_collected += 1
+    if combined_line and fields_collected >= 6:
+        mac_entries.append(_reference_combined_line(combined_line))
+    return mac_entries
+
+
+def _time_parser(parse_function, text, repeat):
+    best = None
+    entries = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        entries = parse_function(text)
+        elapsed_time = time.perf_counter() - start_time
+        best = elapsed_time if best is None else min(best, elapsed_time)
+    return best, entries
+
+
+def _parse_lines(vendor):
+    # What the telnet collector does: one MacTableParser.feed() per streamed line
+    def parse_function(text):
+        parser = MacTableParser(vendor)
+        entries = []
+        for line in text.splitlines():
+            entries.extend(parser.feed(line))
+        entries.extend(parser.close())
+        return entries
+    return parse_function
+
+
+def benchmark(entries=100000, repeat=3):
+    """
+    Compare these parsers with the original line-by-line ones on synthetic tables.
+
+    Prints the best of repeat runs for the reference parser, parse_mac_table and
+    MacTableParser fed line by line, with entries per second and the speedup,
+    and checks that all of them produce the same entries.
+    """
+    cases = [
+        (CDATA_GPON, synthetic_cdata_table(entries), _reference_cdata_gpon, parse_cdata_gpon),
+        (VSOL_GPON, synthetic_vsol_table(entries), _reference_vsol_gpon, parse_vsol_gpon),
+    ]
+    for vendor, text, old_function, new_function in cases:
+        old_time, old_entries = _time_parser(old_function, text, repeat)
+        new_time, new_entries = _time_parser(new_function, text, repeat)
+        line_time, line_entries = _time_parser(_parse_lines(vendor), text, repeat)
+        same = [entry for entry in old_entries if entry] == new_entries == line_entries
+        print(f"{vendor}: {len(new_entries)} entries ({len(text) / 1e6:.1f} MB), outputs {'match' if same else 'DIFFER'}")
+        print(f"  reference            {old_time:.3f} s  {len(old_entries) / old_time:>10.0f} entries/s")
+        print(f"  parse_mac_table      {new_time:.3f} s  {len(new_entries) / new_time:>10.0f} entries/s  ({old_time / new_time:.1f}x)")
+        print(f"  MacTableParser.feed  {line_time:.3f} s  {len(line_entries) / line_time:>10.0f} entries/s  ({old_time / line_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MAC-table parsers against the original line-by-line ones")
+    parser.add_argument("-n", "--entries", type=int, default=100000, help="Entries in each synthetic table (default: 100000)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per parser; the best is reported (default: 3)")
+    args = parser.parse_args()
+    benchmark(args.entries, args.repeat)
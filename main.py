@@ -4,7 +4,8 @@ import os
 from dotenv import load_dotenv
 import argparse
 from enums import CDATA_EPON, CDATA_GPON, VSOL_GPON
-from utils import snmp_walk, parse_cdata_onu_data, parse_vsol_onu_data, insert_into_db
+from utils import walk_onu_data, walk_onu_columns, walk_onu_table, render_varbind_record, store_onu_data, resolve_switch_id
+from db_pool import get_pool_stats, close_db_pool
 import cx_Oracle
 import json
 
@@ -33,14 +34,6 @@ if not snmp_version in [0, 1]:
 # Initialize Oracle client
 cx_Oracle.init_oracle_client(lib_dir=instant_client)
 
-def get_process_function(brand):
-    if brand in [CDATA_EPON, CDATA_GPON]:
-        return parse_cdata_onu_data
-    elif brand == VSOL_GPON:
-        return parse_vsol_onu_data
-    else:
-        raise ValueError(f"Unsupported brand: {brand}")
-
 # Run and display
 async def main():
     supported_brands = {
@@ -54,6 +47,20 @@ async def main():
     parser.add_argument("-debug", type=bool, default=False, help="If True, enable debug mode for detailed logging")
     parser.add_argument("-bd", required=True, choices=list(supported_brands.keys()),
                         help="Brand, e.g., CDATA-EPON or CDATA-GPON")
+    parser.add_argument('-m', '--merge', action='store_true',
+                        help='Upsert ONU rows on (SW_ID, IFINDEX) instead of appending a new copy every run '
+                             '(needs the unique key from migrate_onu_ports.py)')
+    parser.add_argument('--delta', action='store_true',
+                        help='Only write ONUs that are new or changed since the last stored poll of this OLT')
+    parser.add_argument('--power-deadband', type=float, default=float(os.getenv("POWER_DEADBAND", 0.5)),
+                        help='POWER drift in dBm ignored by --delta (default: POWER_DEADBAND or 0.5)')
+    parser.add_argument('-w', '--walk-mode', choices=['subtree', 'columns', 'table'], default='subtree',
+                        help="subtree: walk OID_TO_WALK (default); columns: walk the brand's oid_dictionary columns "
+                             "concurrently; table: walk those columns in lock-step, one ONU row per round trip")
+    parser.add_argument('--bulk', action='store_true', default=os.getenv("SNMP_BULK") == "1",
+                        help='Use GETBULK with adaptive max-repetitions (SNMPv2c only; default: SNMP_BULK=1)')
+    parser.add_argument("-o", "--snmp-output", default=None,
+                        help="Also render the raw walk as net-snmp style text into this file (e.g. snmp_output.txt)")
     args = parser.parse_args()
     print("Running SNMP walk...")
     print(f"Target IP: {target_ip}")
@@ -69,21 +76,35 @@ async def main():
     brand = args.bd
     
     
-    snmp_output = await snmp_walk(target_ip, community_string, oid_to_walk, port, snmp_version, snmp_timeout, snmp_retries, debug_mode)
-    
-    snmp_data_str = "\n".join(snmp_output)
-    
-    output_file = 'snmp_output.txt'
-    with open(output_file, 'w') as f:
-        f.write(snmp_data_str)
-        f.close()
-    print(f"SNMP output saved to {output_file}")
-    print("Parsing SNMP output...")
-    # print(snmp_output)
-    
-    # Parse the SNMP output
-    parse_function = get_process_function(brand)
-    parsed_snmp_output = parse_function(snmp_data_str)
+    # Resolve SW_ID up front (loads the shared SWITCHES cache) so an unknown OLT is reported before the walk.
+    # A database outage must not stop the walk: the lookup runs again at insert time.
+    if not args.dry_run:
+        try:
+            sw_id = resolve_switch_id(target_ip, db_host, db_port, db_user, db_pass, db_sid)
+            print(f"Switch ID for {target_ip}: {sw_id}")
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            print(f"Database error while looking up the switch ID, continuing with the walk: {error.message}")
+
+    # Parse while walking; the raw walk is only rendered if an output file was requested
+    snmp_output_file = open(args.snmp_output, 'w') if args.snmp_output else None
+    on_record = (lambda record: snmp_output_file.write(render_varbind_record(record) + "\n")) if snmp_output_file else None
+    try:
+        if args.walk_mode == 'table':
+            parsed_snmp_output = await walk_onu_table(target_ip, community_string, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, supported_brands[brand], on_record, bulk=args.bulk)
+        elif args.walk_mode == 'columns':
+            parsed_snmp_output = await walk_onu_columns(target_ip, community_string, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, supported_brands[brand], on_record, bulk=args.bulk)
+        else:
+            parsed_snmp_output = await walk_onu_data(target_ip, community_string, oid_to_walk, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, supported_brands[brand], on_record, bulk=args.bulk)
+    finally:
+        if snmp_output_file:
+            snmp_output_file.close()
+            print(f"SNMP output saved to {args.snmp_output}")
+
+    if parsed_snmp_output is None:
+        print("SNMP walk failed: nothing parsed or written.")
+        return
+
     parsed_output_file = 'parsed_snmp_output.txt'
     with open(parsed_output_file, 'w') as f:
         f.write(json.dumps(parsed_snmp_output, indent=2, default=str))
@@ -92,8 +113,13 @@ async def main():
     print(f"Parsed {len(parsed_snmp_output)} ONU devices from SNMP output.")
 
     # Insert into database unless dry run is specified
-    if not args.dry_run:
-        insert_into_db(parsed_snmp_output, target_ip, db_host, db_port, db_user, db_pass, db_sid)
+    if not parsed_snmp_output:
+        print("No ONUs found: nothing inserted into database")
+    elif not args.dry_run:
+        store_onu_data(parsed_snmp_output, target_ip, db_host, db_port, db_user, db_pass, db_sid,
+                       merge=args.merge, delta=args.delta, power_deadband=args.power_deadband)
+        print(f"DB pool stats: {get_pool_stats()}")
+        close_db_pool()
     else:
         print("Dry run mode: Data not inserted into database")
 
@@ -1,18 +1,28 @@
 import argparse
+import ast
 import os
 import logging
+import time
 from pysmi import debug
 from pysmi.reader import FileReader
 from pysmi.writer import PyFileWriter
 from pysmi.parser import SmiStarParser
 from pysmi.codegen import PySnmpCodeGen
 from pysmi.compiler import MibCompiler
-from enums import MIBS, COMPILED_MIBS
+from pysnmp.smi import builder
+from enums import MIBS, COMPILED_MIBS, PRUNED_MIBS
+from snmp_walker import oid_to_tuple
+
+# Vendor MIBs that are large enough to be worth pruning
+PRUNE_MIBS = ['NSCRTV-FTTX-EPON-MIB', 'NSCRTV-FTTX-GPON-MIB', 'V1600D', 'V1600G']
 
 def setup_logging(debug_mode):
     log_file = 'pysmi_debug.log'
     logger = logging.getLogger('pysmi')
     logger.setLevel(logging.DEBUG if debug_mode else logging.INFO)
+    # Called once per walk; a long-running poller must not stack a new handler each time
+    if any(isinstance(h, logging.FileHandler) and h.baseFilename == os.path.abspath(log_file) for h in logger.handlers):
+        return
     file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(logging.DEBUG if debug_mode else logging.INFO)
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -26,6 +36,186 @@ def setup_logging(debug_mode):
         debug.set_logger(debug_instance)
 
 
+def collect_polled_oids(extra_roots=None):
+    """
+    Collect every OID the pollers reference: oid_dictionary, IFDESCR and the
+    configured OID_TO_WALK roots (comma separated).
+    """
+    from dotenv import load_dotenv
+    from oid_dict import oid_dictionary, IFDESCR
+
+    load_dotenv()
+    oids = {oid_to_tuple(oid) for brand_map in oid_dictionary.values() for oid in brand_map.values()}
+    oids.add(oid_to_tuple(IFDESCR))
+    walk_roots = os.getenv("OID_TO_WALK", "")
+    for root in list(filter(None, walk_roots.split(','))) + list(extra_roots or []):
+        oids.add(oid_to_tuple(root))
+    return oids
+
+
+def _imported_symbols(tree, from_module):
+    """Names imported from from_module via mibBuilder.importSymbols in a parsed MIB."""
+    names = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ('importSymbols', 'import_symbols')
+                and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == from_module):
+            names.update(arg.value for arg in node.args[1:] if isinstance(arg, ast.Constant))
+    return names
+
+
+def _statement_owner(stmt):
+    """Symbol a follow-up statement (x.setMaxAccess, _X_Type.__name__ = ..., if loadTexts) belongs to."""
+    if isinstance(stmt, ast.If):
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+                return node.func.value.id
+        return None
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+        func = stmt.value.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id != 'mibBuilder':
+            return func.value.id
+    if isinstance(stmt, ast.Assign) and isinstance(stmt.targets[0], ast.Attribute):
+        target = stmt.targets[0].value
+        if isinstance(target, ast.Name):
+            return target.id
+    return None
+
+
+def _is_export(stmt):
+    return (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Attribute)
+            and stmt.value.func.attr in ('exportSymbols', 'export_symbols'))
+
+
+def prune_mib_source(source, module_name, symbol_oids, wanted_oids, keep_symbols=()):
+    """
+    Strip a pysmi-generated module down to the objects we poll.
+
+    Args:
+        source (str): Python source of the compiled module.
+        module_name (str): MIB module name.
+        symbol_oids (dict): {symbol_name: oid_tuple} for the module's MIB nodes.
+        wanted_oids (set): OIDs we poll; their ancestors and subtrees are kept.
+        keep_symbols (iterable): Symbols to keep regardless (e.g. imported by other MIBs).
+
+    Returns:
+        str: Source of the slim module.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines()
+
+    needed = set(keep_symbols)
+    for symbol_name, oid in symbol_oids.items():
+        for wanted in wanted_oids:
+            shorter = min(len(oid), len(wanted))
+            if oid[:shorter] == wanted[:shorter]:
+                needed.add(symbol_name)
+                break
+
+    defines, owned_by, always_keep = {}, {}, []
+    for stmt in tree.body:
+        if _is_export(stmt):
+            continue
+        if isinstance(stmt, ast.ClassDef):
+            defines.setdefault(stmt.name, []).append(stmt)
+        elif isinstance(stmt, ast.Assign) and isinstance(stmt.targets[0], ast.Name):
+            defines.setdefault(stmt.targets[0].id, []).append(stmt)
+        elif (owner := _statement_owner(stmt)) is not None:
+            owned_by.setdefault(owner, []).append(stmt)
+        else:
+            # Module guard and mibBuilder.importSymbols() tuples
+            always_keep.append(stmt)
+
+    # Close over the names each kept statement references (types, TCs, index columns)
+    pending, kept = list(needed), set()
+    while pending:
+        name = pending.pop()
+        if name in kept or name not in defines:
+            continue
+        kept.add(name)
+        for stmt in defines[name] + owned_by.get(name, []):
+            for node in ast.walk(stmt):
+                if isinstance(node, ast.Name) and node.id in defines:
+                    pending.append(node.id)
+                elif (isinstance(node, ast.Tuple) and len(node.elts) == 3
+                      and all(isinstance(e, ast.Constant) for e in node.elts)
+                      and node.elts[1].value == module_name):
+                    pending.append(node.elts[2].value)
+
+    kept_stmts = set(map(id, always_keep))
+    for name in kept:
+        kept_stmts.update(map(id, defines[name] + owned_by.get(name, [])))
+
+    output = []
+    for stmt in tree.body:
+        if _is_export(stmt):
+            exported = [name for name in symbol_oids.keys() | defines.keys() if name in kept and not name.startswith('_')]
+            exported.sort(key=lambda name: defines[name][0].lineno)
+            body = ",\n       ".join(f'"{name}": {name}' for name in exported)
+            output.append(f'mibBuilder.exportSymbols(\n    "{module_name}",\n    **{{{body}}}\n)')
+        elif id(stmt) in kept_stmts:
+            output.append("\n".join(lines[stmt.lineno - 1:stmt.end_lineno]))
+
+    header = f"# Pruned by mib_compiler.py --prune: {len(kept)} of {len(defines)} definitions kept.\n"
+    return header + "\n\n".join(output) + "\n"
+
+
+def _time_module_load(module_name, mib_dirs):
+    mib_builder = builder.MibBuilder()
+    mib_builder.add_mib_sources(*[builder.DirMibSource(d) for d in mib_dirs if os.path.isdir(d)])
+    t0 = time.time()
+    mib_builder.load_modules(module_name)
+    return time.time() - t0, mib_builder
+
+
+def prune_mibs(modules=PRUNE_MIBS, extra_roots=None):
+    """Emit slim copies of the vendor MIBs into PRUNED_MIBS and report size/load-time reduction."""
+    os.makedirs(PRUNED_MIBS, exist_ok=True)
+    wanted_oids = collect_polled_oids(extra_roots)
+    print(f"Pruning {len(modules)} MIBs to {len(wanted_oids)} polled OIDs")
+
+    compiled_trees = {}
+    for file_name in os.listdir(COMPILED_MIBS):
+        if file_name.endswith('.py'):
+            with open(os.path.join(COMPILED_MIBS, file_name)) as f:
+                compiled_trees[file_name[:-3]] = ast.parse(f.read())
+
+    report = []
+    for module_name in modules:
+        source_path = os.path.join(COMPILED_MIBS, f"{module_name}.py")
+        with open(source_path) as f:
+            source = f.read()
+
+        full_time, mib_builder = _time_module_load(module_name, [COMPILED_MIBS])
+        (MibNode,) = mib_builder.import_symbols('SNMPv2-SMI', 'MibNode')
+        symbol_oids = {
+            name: tuple(symbol.getName())
+            for name, symbol in mib_builder.mibSymbols[module_name].items()
+            if isinstance(symbol, MibNode)
+        }
+        imported_elsewhere = set()
+        for other_module, tree in compiled_trees.items():
+            if other_module != module_name:
+                imported_elsewhere |= _imported_symbols(tree, module_name)
+
+        slim_source = prune_mib_source(source, module_name, symbol_oids, wanted_oids, imported_elsewhere)
+        slim_path = os.path.join(PRUNED_MIBS, f"{module_name}.py")
+        with open(slim_path, 'w') as f:
+            f.write(slim_source)
+
+        slim_time, _ = _time_module_load(module_name, [PRUNED_MIBS, COMPILED_MIBS])
+        report.append((module_name, os.path.getsize(source_path), os.path.getsize(slim_path), full_time, slim_time))
+
+    print(f"\n{'Module':<24}{'Size':>12}{'Pruned':>12}{'Load':>10}{'Pruned':>10}{'Saved':>8}")
+    for module_name, full_size, slim_size, full_time, slim_time in report:
+        saved = 100 * (1 - slim_time / full_time) if full_time else 0
+        print(f"{module_name:<24}{full_size / 1024:>10.1f}KB{slim_size / 1024:>10.1f}KB"
+              f"{full_time:>9.2f}s{slim_time:>9.2f}s{saved:>7.0f}%")
+    print(f"\nPruned MIBs written to {PRUNED_MIBS}; load_mibs prefers them over {COMPILED_MIBS}.")
+    return report
+
+
 def main(debug_mode):
     setup_logging(debug_mode)
 
@@ -71,6 +261,14 @@ def main(debug_mode):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Compile MIB files with optional debug logging")
     parser.add_argument('-d', '--debug', action='store_true', help='Enable debug mode with detailed logging')
+    parser.add_argument('--prune', action='store_true',
+                        help=f'Emit slim copies of the vendor MIBs into {PRUNED_MIBS} containing only polled objects')
+    parser.add_argument('--oid', action='append', default=[],
+                        help='Extra OID root to keep when pruning (repeatable); OID_TO_WALK is always kept')
 
     args = parser.parse_args()
-    main(args.debug)
+    if args.prune:
+        setup_logging(args.debug)
+        prune_mibs(extra_roots=args.oid)
+    else:
+        main(args.debug)
@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import mmap
+import os
+import pickle
+import time
+from enums import COMPILED_MIBS, PRUNED_MIBS, MIB_SNAPSHOT
+
+SNAPSHOT_VERSION = 1
+
+# Pruned modules shadow the full ones in load_mibs, so both feed the hash
+MIB_DIRS = (PRUNED_MIBS, COMPILED_MIBS)
+
+
+def compute_mib_hash(mib_dirs=MIB_DIRS):
+    """
+    Hash the compiled MIB modules so a snapshot can detect when it is stale.
+
+    Args:
+        mib_dirs (tuple): Directories holding pysmi-generated *.py modules.
+
+    Returns:
+        str: Hex digest over the file names and contents of every module.
+    """
+    digest = hashlib.sha256()
+    for mib_dir in mib_dirs:
+        if not os.path.isdir(mib_dir):
+            continue
+        for file_name in sorted(os.listdir(mib_dir)):
+            if not file_name.endswith('.py'):
+                continue
+            digest.update(file_name.encode())
+            with open(os.path.join(mib_dir, file_name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def build_oid_table(mib_builder):
+    """
+    Flatten every MIB node known to the builder into a numeric lookup table.
+
+    Args:
+        mib_builder: A MibBuilder with the required modules already loaded.
+
+    Returns:
+        dict: {oid_tuple: (module_name, symbol_name, syntax_name)}. syntax_name
+              is None for nodes without a syntax (identifiers, tables, rows).
+    """
+    (MibNode,) = mib_builder.import_symbols('SNMPv2-SMI', 'MibNode')
+    oid_table = {}
+    for module_name, symbols in mib_builder.mibSymbols.items():
+        for symbol_name, symbol in symbols.items():
+            if not isinstance(symbol, MibNode):
+                continue
+            oid = tuple(symbol.getName())
+            if not oid or oid in oid_table:
+                continue
+            syntax = symbol.getSyntax() if hasattr(symbol, 'getSyntax') else None
+            syntax_name = type(syntax).__name__ if syntax is not None else None
+            oid_table[oid] = (module_name, symbol_name, syntax_name)
+    return oid_table
+
+
+def write_snapshot(oid_table, modules, snapshot_path=MIB_SNAPSHOT, mib_dirs=MIB_DIRS):
+    """Serialize the OID table, keyed by the hash of the compiled MIBs, to disk."""
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'hash': compute_mib_hash(mib_dirs),
+        'modules': list(modules),
+        'table': oid_table,
+    }
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+    return snapshot
+
+
+def _fall_back(snapshot_path, reason):
+    # The only message for an unusable snapshot, so callers need not print their own
+    print(f"MIB snapshot {snapshot_path} {reason}, falling back to MibBuilder "
+          f"(run 'python mib_snapshot.py' to rebuild it).")
+    return None
+
+
+def load_snapshot(modules, snapshot_path=MIB_SNAPSHOT, mib_dirs=MIB_DIRS):
+    """
+    Memory-map the snapshot and return its OID table if it is still current.
+
+    Args:
+        modules (list): MIB modules the caller expects the snapshot to cover.
+        snapshot_path (str): Location of the pickled snapshot.
+        mib_dirs (tuple): Directories the snapshot hash was computed over.
+
+    Returns:
+        dict | None: The OID table, or None (after printing why) when the snapshot
+                     is missing or unreadable, was built for other modules,
+                     or the compiled MIBs changed.
+    """
+    if not os.path.exists(snapshot_path):
+        return _fall_back(snapshot_path, "not found")
+    try:
+        with open(snapshot_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                snapshot = pickle.loads(mapped)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+        return _fall_back(snapshot_path, f"could not be read ({e})")
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return _fall_back(snapshot_path, "was written by another version")
+    missing_modules = sorted(set(modules) - set(snapshot.get('modules', [])))
+    if missing_modules:
+        return _fall_back(snapshot_path, f"does not cover {', '.join(missing_modules)}")
+    if snapshot.get('hash') != compute_mib_hash(mib_dirs):
+        return _fall_back(snapshot_path, "is stale")
+    return snapshot['table']
+
+
+def main(debug_mode):
+    # Imported here so that utils can depend on this module without a cycle
+    from utils import load_mibs, BRAND_MIB_MAP
+    from mib_compiler import setup_logging
+
+    setup_logging(debug_mode)
+    start_time = time.time()
+    mib_builder = load_mibs()
+    oid_table = build_oid_table(mib_builder)
+    write_snapshot(oid_table, BRAND_MIB_MAP)
+    print(f"Wrote {len(oid_table)} OIDs to {MIB_SNAPSHOT} in {time.time() - start_time:.2f} seconds.")
+
+    t0 = time.time()
+    load_snapshot(BRAND_MIB_MAP)
+    print(f"Snapshot load time: {time.time() - t0:.3f} seconds.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pickled MIB symbol snapshot used by load_oid_table")
+    parser.add_argument('-d', '--debug', action='store_true', help='Enable debug mode with detailed logging')
+
+    args = parser.parse_args()
+    main(args.debug)
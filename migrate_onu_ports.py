@@ -0,0 +1,118 @@
+import argparse
+import os
+import time
+import cx_Oracle
+from dotenv import load_dotenv
+from db_pool import db_connection, close_db_pool
+from utils import has_onu_port_unique_key
+
+load_dotenv()
+
+db_host = os.getenv("DB_HOST")
+db_port = os.getenv("DB_PORT")
+db_user = os.getenv("DB_USER")
+db_pass = os.getenv("DB_PASS")
+db_sid = os.getenv("DB_SID")
+instant_client = os.getenv("INSTANT_CLIENT_LOC")
+
+# (SW_ID, IFINDEX) pairs that the append-only INSERT has written more than once
+COUNT_DUPLICATES_SQL = """
+SELECT COUNT(*), NVL(SUM(cnt - 1), 0) FROM (
+    SELECT COUNT(*) AS cnt FROM SWITCH_SNMP_ONU_PORTS
+    WHERE SW_ID IS NOT NULL OR IFINDEX IS NOT NULL
+    GROUP BY SW_ID, IFINDEX HAVING COUNT(*) > 1
+)
+"""
+
+# Every row but the newest of each ONU (latest UDATE, then highest ID).
+# Rows where both key columns are NULL are not indexed, so they are left alone.
+DUPLICATE_ROWIDS_SQL = """
+SELECT rid FROM (
+    SELECT ROWID AS rid,
+           ROW_NUMBER() OVER (PARTITION BY SW_ID, IFINDEX ORDER BY UDATE DESC NULLS LAST, ID DESC) AS rn
+    FROM SWITCH_SNMP_ONU_PORTS
+    WHERE SW_ID IS NOT NULL OR IFINDEX IS NOT NULL
+) WHERE rn > 1
+"""
+
+# The history rows are archived here, with the same columns, before they are deleted
+HISTORY_TABLE = "SWITCH_SNMP_ONU_PORTS_HIST"
+HISTORY_TABLE_EXISTS_SQL = f"SELECT COUNT(*) FROM USER_TABLES WHERE TABLE_NAME = '{HISTORY_TABLE}'"
+CREATE_HISTORY_TABLE_SQL = f"CREATE TABLE {HISTORY_TABLE} AS SELECT * FROM SWITCH_SNMP_ONU_PORTS WHERE 1 = 0"
+ARCHIVE_DUPLICATES_SQL = f"INSERT INTO {HISTORY_TABLE} SELECT * FROM SWITCH_SNMP_ONU_PORTS WHERE ROWID IN ({DUPLICATE_ROWIDS_SQL})"
+DELETE_DUPLICATES_SQL = f"DELETE FROM SWITCH_SNMP_ONU_PORTS WHERE ROWID IN ({DUPLICATE_ROWIDS_SQL})"
+
+CREATE_UNIQUE_KEY_SQL = "CREATE UNIQUE INDEX SWITCH_SNMP_ONU_PORTS_SW_IFX_UK ON SWITCH_SNMP_ONU_PORTS (SW_ID, IFINDEX)"
+
+
+def migrate(dry_run, assume_yes=False):
+    """
+    Prepare SWITCH_SNMP_ONU_PORTS for merge mode (-m/--merge in main.py and poller.py).
+
+    Moves the history rows the append-only INSERT left behind into
+    SWITCH_SNMP_ONU_PORTS_HIST, keeping the newest row per (SW_ID, IFINDEX),
+    then creates the unique index MERGE relies on. The copy and the delete
+    are committed together, so no row is lost if either fails.
+
+    Args:
+        dry_run (bool): Only report what would be moved.
+        assume_yes (bool): Do not ask for confirmation before moving the rows.
+
+    Returns:
+        bool: True if the table has the unique key afterwards (or would, for a dry run).
+    """
+    with db_connection(db_host, db_port, db_user, db_pass, db_sid) as connection:
+        cursor = connection.cursor()
+        if has_onu_port_unique_key(cursor):
+            print("SWITCH_SNMP_ONU_PORTS already has a unique (SW_ID, IFINDEX) key, nothing to do.")
+            return True
+
+        cursor.execute(COUNT_DUPLICATES_SQL)
+        onus, extra_rows = cursor.fetchone()
+        print(f"Found {onus} ONUs with {extra_rows} duplicate history rows.")
+        if dry_run:
+            print(f"Dry run mode: Nothing moved to {HISTORY_TABLE} or created")
+            return True
+        if extra_rows and not assume_yes:
+            answer = input(f"Move {extra_rows} history rows to {HISTORY_TABLE} and delete them from SWITCH_SNMP_ONU_PORTS? [y/N] ")
+            if answer.strip().lower() not in ('y', 'yes'):
+                print("Aborted: Nothing moved or created")
+                return False
+
+        if extra_rows:
+            cursor.execute(HISTORY_TABLE_EXISTS_SQL)
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(CREATE_HISTORY_TABLE_SQL)
+                print(f"Created {HISTORY_TABLE}.")
+
+            start_time = time.time()
+            cursor.execute(ARCHIVE_DUPLICATES_SQL)
+            archived = cursor.rowcount
+            cursor.execute(DELETE_DUPLICATES_SQL)
+            deleted = cursor.rowcount
+            if archived != deleted:
+                connection.rollback()
+                print(f"Error: Archived {archived} rows but would delete {deleted}; rolled back, nothing changed.")
+                return False
+            connection.commit()
+            print(f"Moved {deleted} duplicate rows to {HISTORY_TABLE} in {time.time() - start_time:.2f} seconds.")
+
+        cursor.execute(CREATE_UNIQUE_KEY_SQL)
+        print("Created unique index SWITCH_SNMP_ONU_PORTS_SW_IFX_UK on (SW_ID, IFINDEX).")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move duplicate ONU history rows to SWITCH_SNMP_ONU_PORTS_HIST and add the unique key merge mode needs")
+    parser.add_argument('-d', '--dry-run', action='store_true', help='Only report how many duplicate rows would be moved')
+    parser.add_argument('-y', '--yes', action='store_true', help='Move the rows without asking for confirmation')
+    args = parser.parse_args()
+
+    cx_Oracle.init_oracle_client(lib_dir=instant_client)
+    try:
+        migrate(args.dry_run, args.yes)
+    except cx_Oracle.DatabaseError as e:
+        error, = e.args
+        print(f"Database error: {error.message}")
+    finally:
+        close_db_pool()
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class VarBindRecord(NamedTuple):
+    """A resolved varbind: numeric OID split into its MIB column and index, with the raw pyasn1 value"""
+    oid: tuple
+    module: str
+    symbol: str
+    index: tuple
+    value: object
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entry')
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+
+
+class OidResolver:
+    """
+    Prefix trie over numeric OIDs, built once from the loaded MIB OID table.
+
+    Each node carries the (module, symbol, syntax) entry of the MIB object that
+    ends there, so a varbind OID is resolved to "MODULE::symbol.index" by a
+    single longest-prefix walk instead of a MIB view lookup per varbind.
+    """
+
+    def __init__(self, oid_table=None, miss_handler=None, column_cache_size=256):
+        """
+        Args:
+            oid_table (dict): {oid_tuple: (module_name, symbol_name, syntax_name)}.
+            miss_handler (callable): Called as miss_handler(oid, entry) after a lookup
+                so the owner can lazily add MIBs covering the OID. Returns True if
+                it added new entries, in which case the lookup is retried once.
+            column_cache_size (int): Number of column prefixes kept in the LRU cache.
+        """
+        self._root = _TrieNode()
+        self.miss_handler = miss_handler
+        self.size = 0
+        # {column_prefix_tuple: "MODULE::symbol"}, most recently used last
+        self._column_cache = OrderedDict()
+        self._column_prefix_lengths = set()
+        self.column_cache_size = column_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if oid_table:
+            self.update(oid_table)
+
+    def add(self, oid, entry):
+        """Insert an entry; an OID that is already known keeps its first entry."""
+        node = self._root
+        for arc in oid:
+            child = node.children.get(arc)
+            if child is None:
+                child = node.children[arc] = _TrieNode()
+            node = child
+        if node.entry is None:
+            node.entry = entry
+            self.size += 1
+
+    def update(self, oid_table):
+        for oid, entry in oid_table.items():
+            self.add(oid, entry)
+
+    def match(self, oid):
+        """
+        Find the deepest MIB object on the path of an OID.
+
+        Returns:
+            tuple: (entry, prefix_len); entry is None if nothing matched.
+        """
+        node = self._root
+        entry, prefix_len = None, 0
+        for depth, arc in enumerate(oid, 1):
+            node = node.children.get(arc)
+            if node is None:
+                break
+            if node.entry is not None:
+                entry, prefix_len = node.entry, depth
+        return entry, prefix_len
+
+    def _cached_column(self, oid):
+        for prefix_len in self._column_prefix_lengths:
+            prefix = oid[:prefix_len]
+            entry = self._column_cache.get(prefix)
+            if entry is not None:
+                self._column_cache.move_to_end(prefix)
+                return entry, prefix_len
+        return None, 0
+
+    def _cache_column(self, prefix, entry):
+        self._column_cache[prefix] = entry
+        self._column_prefix_lengths.add(len(prefix))
+        if len(self._column_cache) > self.column_cache_size:
+            self._column_cache.popitem(last=False)
+
+    def lookup(self, oid):
+        """
+        Resolve an OID tuple to its MIB object, using the column cache when possible.
+
+        Returns:
+            tuple: (entry, prefix_len) as in match(); entry is None if unknown.
+        """
+        # Walks return one column at a time: after the first varbind of a column
+        # only the index suffix differs, so skip the trie walk for the rest.
+        entry, prefix_len = self._cached_column(oid)
+        if entry is not None:
+            self.cache_hits += 1
+            return entry, prefix_len
+
+        self.cache_misses += 1
+        entry, prefix_len = self.match(oid)
+        if self.miss_handler is not None and self.miss_handler(oid, entry):
+            entry, prefix_len = self.match(oid)
+        # Only leaf objects (columns/scalars) are cached; nothing can resolve deeper
+        if entry is not None and entry[2] is not None:
+            self._cache_column(oid[:prefix_len], entry)
+        return entry, prefix_len
+
+    def resolve(self, oid):
+        """Resolve a numeric OID to MODULE::symbol.index, or its dotted form if unknown"""
+        oid = tuple(oid)
+        entry, prefix_len = self.lookup(oid)
+        if entry is None:
+            return '.'.join([str(i) for i in oid])
+        module_name, obj_name, _ = entry
+        indices = oid[prefix_len:]
+        index_str = '.' + '.'.join([str(i) for i in indices]) if indices else ''
+        return f"{module_name}::{obj_name}{index_str}"
+
+    def resolve_record(self, oid, value):
+        """Resolve a varbind into a VarBindRecord; unknown OIDs get module None and a dotted symbol"""
+        oid = tuple(oid)
+        entry, prefix_len = self.lookup(oid)
+        if entry is None:
+            return VarBindRecord(oid, None, '.'.join([str(i) for i in oid]), (), value)
+        return VarBindRecord(oid, entry[0], entry[1], oid[prefix_len:], value)
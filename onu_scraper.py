@@ -129,6 +129,7 @@ def scrape_onu_data(target_ip):
 def main():
     parser = argparse.ArgumentParser(description='Process ONU data from SNMP output and insert into database')
     parser.add_argument('-d', '--dry-run', action='store_true', help='Parse data but do not insert into database')
+    parser.add_argument('--direct-path', action='store_true', help='Load the MAC table with the APPEND_VALUES direct-path hint')
     args = parser.parse_args()
     
     # Scrape ONU data
@@ -140,7 +141,7 @@ def main():
     # Insert into database
     if not args.dry_run:
         print("Inserting data into database...")
-        insert_into_db_olt_customer_mac(onu_data, target_ip, db_host, db_port, db_user, db_pass, db_sid)
+        insert_into_db_olt_customer_mac(onu_data, target_ip, db_host, db_port, db_user, db_pass, db_sid, append_values=args.direct_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
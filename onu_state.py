@@ -0,0 +1,111 @@
+import os
+import pickle
+from datetime import timedelta
+from enums import ONU_STATE_DIR
+
+# Fields compared exactly between polls; POWER, DISTANCE and UP_SINCE get tolerances
+ONU_STATE_FIELDS = ['MAC', 'STATUS', 'SLNO', 'ONU_MODEL', 'ONU_VENDOR', 'IFINDEX', 'IFINDEX2']
+
+# UP_SINCE is now() - uptime, so it moves slightly every poll even without a re-registration
+UP_SINCE_TOLERANCE = timedelta(seconds=60)
+
+
+def _state_path(olt_key, state_dir=ONU_STATE_DIR):
+    safe_key = "".join([c if c.isalnum() or c in '.-' else '_' for c in str(olt_key)])
+    return os.path.join(state_dir, f"{safe_key}.pickle")
+
+
+def load_onu_state(olt_key, state_dir=ONU_STATE_DIR):
+    """
+    Load the ONU data last written for an OLT.
+
+    Args:
+        olt_key (str): Identifies the OLT, normally its IP address.
+        state_dir (str): Directory holding one snapshot file per OLT.
+
+    Returns:
+        dict: {onu_key: {field: value}}, empty if the OLT was never stored.
+    """
+    path = _state_path(olt_key, state_dir)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Warning: Could not read ONU state {path}: {e}")
+        return {}
+
+
+def save_onu_state(olt_key, onu_data, state_dir=ONU_STATE_DIR):
+    """Atomically replace the stored ONU data of an OLT."""
+    os.makedirs(state_dir, exist_ok=True)
+    path = _state_path(olt_key, state_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(onu_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _outside_deadband(old, new, deadband):
+    if old is None or new is None:
+        return old is not new
+    return abs(new - old) > deadband
+
+
+def onu_changed(previous, current, power_deadband=0.5, distance_deadband=0):
+    """Return True if an ONU differs in any tracked field, ignoring drift inside the deadbands"""
+    for field in ONU_STATE_FIELDS:
+        if previous.get(field) != current.get(field):
+            return True
+    if _outside_deadband(previous.get('POWER'), current.get('POWER'), power_deadband):
+        return True
+    if _outside_deadband(previous.get('DISTANCE'), current.get('DISTANCE'), distance_deadband):
+        return True
+    return _outside_deadband(previous.get('UP_SINCE'), current.get('UP_SINCE'), UP_SINCE_TOLERANCE)
+
+
+def diff_onu_data(previous, current, power_deadband=0.5, distance_deadband=0):
+    """
+    Classify each ONU of the current poll against the previous one.
+
+    Args:
+        previous (dict): ONU data from load_onu_state.
+        current (dict): ONU data from parse_cdata_onu_data/parse_vsol_onu_data.
+        power_deadband (float): POWER changes up to this many dBm are ignored.
+        distance_deadband (int): DISTANCE changes up to this many meters are ignored.
+
+    Returns:
+        dict: {'new', 'removed', 'changed', 'unchanged'} -> {onu_key: data}.
+              'removed' holds the previous data, the others the current data.
+    """
+    diff = {'new': {}, 'removed': {}, 'changed': {}, 'unchanged': {}}
+    for index, data in current.items():
+        old = previous.get(index)
+        if old is None:
+            diff['new'][index] = data
+        elif onu_changed(old, data, power_deadband, distance_deadband):
+            diff['changed'][index] = data
+        else:
+            diff['unchanged'][index] = data
+    for index, data in previous.items():
+        if index not in current:
+            diff['removed'][index] = data
+    return diff
+
+
+def next_onu_state(previous, diff):
+    """
+    State to store once the delta has been written.
+
+    Unchanged ONUs keep their previously written values, so drift that stays
+    inside the deadband on every poll still gets written once it adds up.
+    """
+    state = {index: previous[index] for index in diff['unchanged']}
+    state.update(diff['new'])
+    state.update(diff['changed'])
+    return state
+
+
+def summarize_diff(diff):
+    return ", ".join([f"{len(diff[kind])} {kind}" for kind in ('new', 'changed', 'removed', 'unchanged')])
@@ -0,0 +1,169 @@
+import asyncio
+import argparse
+import json
+import os
+import time
+import cx_Oracle
+from dotenv import load_dotenv
+from enums import CDATA_EPON, CDATA_GPON, VSOL_GPON
+from utils import walk_onu_data, store_onu_data, load_oid_table, resolve_switch_id
+from db_pool import get_pool_stats, close_db_pool
+from snmp_session import get_snmp_engine, get_transport_stats
+
+load_dotenv()
+
+# Defaults for inventory entries that do not set their own values
+oid_to_walk = os.getenv("OID_TO_WALK")
+snmp_timeout = int(os.getenv("SNMP_TIMEOUT", 3))
+snmp_retries = int(os.getenv("SNMP_RETRIES", 3))
+db_host = os.getenv("DB_HOST")
+db_port = os.getenv("DB_PORT")
+db_user = os.getenv("DB_USER")
+db_pass = os.getenv("DB_PASS")
+db_sid = os.getenv("DB_SID")
+instant_client = os.getenv("INSTANT_CLIENT_LOC")
+
+SUPPORTED_BRANDS = [CDATA_EPON, CDATA_GPON, VSOL_GPON]
+
+
+def load_inventory(inventory_file):
+    """
+    Read the OLT inventory.
+
+    The file is a JSON list of objects, e.g.
+        [{"ip": "10.0.0.1", "community": "public", "brand": "CDATA-EPON",
+          "version": "2c", "port": 161, "oid": "1.3.6.1.4.1.17409.2.3"}]
+    port (161), version ("2c"), oid (OID_TO_WALK) and bulk (the --bulk flag)
+    are optional; bulk is ignored for version "1".
+
+    Returns:
+        list: Device dicts with snmp_version mapped to the pysnmp mpModel.
+    """
+    with open(inventory_file) as f:
+        entries = json.load(f)
+
+    devices = []
+    for entry in entries:
+        brand = entry.get('brand', '').upper()
+        if brand not in SUPPORTED_BRANDS:
+            raise ValueError(f"Unsupported brand for {entry.get('ip')}: {entry.get('brand')}")
+        oid = entry.get('oid', oid_to_walk)
+        if not entry.get('ip') or not entry.get('community') or not oid:
+            raise ValueError(f"Inventory entry needs ip, community and oid (or OID_TO_WALK): {entry}")
+        devices.append({
+            'ip': entry['ip'],
+            'community': entry['community'],
+            'brand': brand,
+            'oid': oid,
+            'port': int(entry.get('port', 161)),
+            'snmp_version': 0 if str(entry.get('version', '2c')) == '1' else 1,  # 0 = SNMPv1, 1 = SNMPv2c
+            'bulk': entry.get('bulk'),
+        })
+    return devices
+
+
+async def poll_olt(device, snmp_engine, semaphore, args):
+    """Walk one OLT under the concurrency limit, then hand its ONU data to the insert path"""
+    ip = device['ip']
+    async with semaphore:
+        start_time = time.time()
+        try:
+            onu_data = await walk_onu_data(ip, device['community'], device['oid'], device['port'], device['snmp_version'],
+                                           snmp_timeout, snmp_retries, args.debug, device['brand'], snmp_engine=snmp_engine,
+                                           bulk=args.bulk if device['bulk'] is None else bool(device['bulk']))
+        except Exception as e:
+            print(f"[{ip}] Walk failed: {e}")
+            return False
+        if onu_data is None:
+            print(f"[{ip}] Walk failed, skipping the store.")
+            return False
+        print(f"[{ip}] Parsed {len(onu_data)} ONUs in {time.time() - start_time:.2f} seconds.")
+
+    if not onu_data:
+        # The OLT reported no ONUs; storing that would mark every saved ONU as removed
+        return False
+    if args.dry_run:
+        return True
+    # The Oracle client blocks, so writes run in a worker thread while other walks continue
+    try:
+        return await asyncio.to_thread(store_onu_data, onu_data, ip, db_host, db_port, db_user, db_pass, db_sid,
+                                       args.merge, args.delta, args.power_deadband)
+    except Exception as e:
+        # e.g. an OSError saving the ONU state or a pool/interface error; other OLTs carry on
+        print(f"[{ip}] Store failed: {e}")
+        return False
+
+
+async def poll_cycle(devices, snmp_engine, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    start_time = time.time()
+    results = await asyncio.gather(*[poll_olt(device, snmp_engine, semaphore, args) for device in devices],
+                                   return_exceptions=True)
+    # One OLT failing in an unexpected way must not stop the cycle (or the daemon) for the rest
+    for device, result in zip(devices, results):
+        if isinstance(result, Exception):
+            print(f"[{device['ip']}] Poll failed: {result}")
+    succeeded = sum([1 for result in results if result is True])
+    elapsed_time = time.time() - start_time
+    print(f"Poll cycle finished: {succeeded}/{len(devices)} OLTs succeeded in {elapsed_time:.2f} seconds.")
+    print(f"SNMP transport pool: {get_transport_stats()}")
+    if not args.dry_run:
+        print(f"DB pool stats: {get_pool_stats()}")
+    return elapsed_time
+
+
+async def run(args):
+    devices = load_inventory(args.inventory)
+    print(f"Loaded {len(devices)} OLTs from {args.inventory} (concurrency {args.concurrency}).")
+
+    # Load the MIB OID table once for the whole fleet; every walk shares the process-wide engine
+    load_oid_table()
+    snmp_engine = get_snmp_engine()
+
+    if not args.dry_run:
+        # Warm the SWITCHES cache with a single query for all OLTs. If the database is down
+        # the daemon still starts: every insert looks its switch up again.
+        try:
+            for device in devices:
+                if resolve_switch_id(device['ip'], db_host, db_port, db_user, db_pass, db_sid) is None:
+                    print(f"Warning: No switch found with IP {device['ip']} in SWITCHES table.")
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            print(f"Database error while warming the switch cache, continuing: {error.message}")
+
+    try:
+        while True:
+            elapsed_time = await poll_cycle(devices, snmp_engine, args)
+            if args.once:
+                break
+            await asyncio.sleep(max(0, args.interval - elapsed_time))
+    finally:
+        close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll many OLTs concurrently and store their ONU data")
+    parser.add_argument("-i", "--inventory", required=True, help="JSON inventory of OLTs (ip, community, brand, version, port, oid)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("POLL_CONCURRENCY", 10)),
+                        help="Maximum OLTs walked at the same time (default: POLL_CONCURRENCY or 10)")
+    parser.add_argument("--interval", type=int, default=int(os.getenv("POLL_INTERVAL", 300)),
+                        help="Seconds between the start of poll cycles (default: POLL_INTERVAL or 300)")
+    parser.add_argument("--once", action="store_true", help="Run a single poll cycle and exit")
+    parser.add_argument('-d', '--dry-run', action='store_true', help='Parse data but do not insert into database')
+    parser.add_argument('-m', '--merge', action='store_true', help='Upsert ONU rows on (SW_ID, IFINDEX) (needs the unique key from migrate_onu_ports.py)')
+    parser.add_argument('--delta', action='store_true', help='Only write ONUs that changed since the last poll')
+    parser.add_argument('--power-deadband', type=float, default=float(os.getenv("POWER_DEADBAND", 0.5)),
+                        help='POWER drift in dBm ignored by --delta (default: POWER_DEADBAND or 0.5)')
+    parser.add_argument('--bulk', action='store_true', default=os.getenv("SNMP_BULK") == "1",
+                        help='Use GETBULK with adaptive max-repetitions on SNMPv2c OLTs (default: SNMP_BULK=1)')
+    parser.add_argument("--debug", action="store_true", help="Enable debug mode for detailed logging")
+    args = parser.parse_args()
+
+    if not args.dry_run:
+        cx_Oracle.init_oracle_client(lib_dir=instant_client)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
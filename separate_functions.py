@@ -1,7 +1,8 @@
 import asyncio
 from enums import MAC, OPERATION_STATUS, ADMIN_STATUS, DISTANCE, UP_SINCE, VENDOR, MODEL, SERIAL_NO, POWER, CDATA_EPON, CDATA_GPON, VSOL_GPON
 import argparse
-from helper import get_olt_information
+from helper import get_olt_information, get_onu_information
+from index_encoder import expand_interface_strings
 from process_data import process_cdata, process_vsol_gpon
 
 def process_snmp_data(snmp_output_lines, brand, olt_type):
@@ -57,7 +58,8 @@ async def main():
     parser.add_argument("-t", type=int, default=3, help="SNMP timeout in seconds (default: 3)")
     parser.add_argument("-idx", type=str, default=None,
                         help="Specific interface index string to query (e.g., 'gpon0/0/1/12'). "
-                             "If provided, performs an SNMP GET for this specific index.")
+                             "If provided, performs an SNMP GET for this specific index. A range or list "
+                             "(e.g., 'gpon0/2/4/1..64,gpon0/2/5/3') is fetched with batched GETs.")
     parser.add_argument("-s", type=str, default=None, help="Specify if the outputs should be stored or not and add the file name")
     parser.add_argument("-cr", type=int, default=None, help="ONU Card ID/ required to encode to onuDeviceIndex")
     parser.add_argument("-all", type=bool, default=False, help="If True, all OIDs will be queried. If False, only the specified branch will be queried.")
@@ -90,20 +92,37 @@ async def main():
 
     print(f"Querying branch '{selected_branch_name}' for brand '{brand}'")
 
-    # Call the function to get OLT information
-    result = await get_olt_information(
-        target_ip=target_ip,
-        community_string=community_string,
-        port=port,
-        version=snmp_version,
-        retries=snmp_retries,
-        timeout=snmp_timeout,
-        branch=selected_branch_constant,
-        brand=brand,
-        onu_index_str=interface_index_str,
-        card_id=card_id,
-        all_oid=all_oid
-    )
+    onu_index_strs = expand_interface_strings(interface_index_str) if interface_index_str else []
+    if len(onu_index_strs) > 1:
+        # Many ONUs: pack their OIDs into batched GETs instead of one request (or a walk) per ONU
+        onu_results = await get_onu_information(
+            target_ip=target_ip,
+            community_string=community_string,
+            port=port,
+            version=snmp_version,
+            retries=snmp_retries,
+            timeout=snmp_timeout,
+            brand=brand,
+            onu_index_strs=onu_index_strs,
+            card_id=card_id,
+            branches=None if all_oid else [selected_branch_constant]
+        )
+        result = [line for onu_result in onu_results.values() for line in onu_result.values()]
+    else:
+        # Call the function to get OLT information
+        result = await get_olt_information(
+            target_ip=target_ip,
+            community_string=community_string,
+            port=port,
+            version=snmp_version,
+            retries=snmp_retries,
+            timeout=snmp_timeout,
+            branch=selected_branch_constant,
+            brand=brand,
+            onu_index_str=interface_index_str,
+            card_id=card_id,
+            all_oid=all_oid
+        )
     
     # Process the SNMP data
     # The 'brand' argument for process_snmp_data is used to check if it's CDATA_EPON or CDATA_GPON
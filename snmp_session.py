@@ -1,19 +1,68 @@
 # snmp_session.py
+import os
+from collections import OrderedDict
 from pysnmp.hlapi.v3arch.asyncio import *
+from pysnmp.hlapi.v3arch.asyncio.cmdgen import LCD
+from pysnmp.entity import config
 from typing import Tuple
 
-# Global cache for session components
-_session_cache = {}
+# One engine (and so one UDP socket and dispatcher) for the whole process
+_snmp_engine = None
+
+# (ip, port, timeout, retries) -> UdpTransportTarget, least recently used first
+_transport_cache = OrderedDict()
+_transport_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def get_snmp_engine() -> SnmpEngine:
+    """Return the process-wide SnmpEngine shared by every walk and GET"""
+    global _snmp_engine
+    if _snmp_engine is None:
+        _snmp_engine = SnmpEngine()
+    return _snmp_engine
+
+def _forget_target(snmp_engine, transport):
+    # Drop the engine's target address entries for an evicted transport, so the
+    # engine's configuration stays bounded along with the pool
+    cache = LCD._get_cache(snmp_engine)
+    for addr_key in [key for key in cache['addr']
+                     if key[2] == transport.transport_address and key[3] == transport.timeout and key[4] == transport.retries]:
+        addr_name, _ = cache['addr'].pop(addr_key)
+        config.delete_target_address(snmp_engine, addr_name)
+
+async def get_transport(ip: str, port: int, timeout: int, retries: int) -> UdpTransportTarget:
+    """
+    Return a pooled UdpTransportTarget for ip:port.
+
+    The pool holds at most SNMP_TRANSPORT_POOL_SIZE targets (default 256);
+    the least recently used one is evicted when it is full.
+    """
+    key = (ip, port, timeout, retries)
+    transport = _transport_cache.get(key)
+    if transport is not None:
+        _transport_cache.move_to_end(key)
+        _transport_stats['hits'] += 1
+        return transport
+
+    _transport_stats['misses'] += 1
+    transport = await UdpTransportTarget.create((ip, port), timeout=timeout, retries=retries)
+    _transport_cache[key] = transport
+
+    pool_size = int(os.getenv("SNMP_TRANSPORT_POOL_SIZE", 256))
+    while len(_transport_cache) > pool_size:
+        _, evicted = _transport_cache.popitem(last=False)
+        _transport_stats['evictions'] += 1
+        if _snmp_engine is not None:
+            _forget_target(_snmp_engine, evicted)
+    return transport
 
 async def get_snmp_session(ip: str, port: int, community: str, version: int, timeout: int, retries: int) -> Tuple[SnmpEngine, CommunityData, UdpTransportTarget, ContextData]:
-    key = f"{ip}:{port}:{community}:{version}"
-    
-    if key not in _session_cache:
-        snmp_engine = SnmpEngine()
-        community_data = CommunityData(community, mpModel=version)
-        transport = await UdpTransportTarget.create((ip, port), timeout=timeout, retries=retries)
-        context = ContextData()
-        
-        _session_cache[key] = (snmp_engine, community_data, transport, context)
-
-    return _session_cache[key]
+    snmp_engine = get_snmp_engine()
+    community_data = CommunityData(community, mpModel=version)
+    transport = await get_transport(ip, port, timeout, retries)
+    context = ContextData()
+
+    return snmp_engine, community_data, transport, context
+
+def get_transport_stats():
+    """Transport pool hits, misses, evictions and current size, for monitoring"""
+    return {**_transport_stats, 'size': len(_transport_cache)}
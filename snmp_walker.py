@@ -0,0 +1,288 @@
+# snmp_walker.py
+import os
+from pysnmp.hlapi.v3arch.asyncio import *
+from pysnmp.proto import errind
+from pysnmp.proto.rfc1902 import ObjectName
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchObject, NoSuchInstance
+
+# pysnmp's errorStatus values for tooBig and (SNMPv1) noSuchName
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+
+# Values that end a walk instead of being returned as data
+END_OF_WALK_TYPES = (EndOfMibView, NoSuchObject, NoSuchInstance)
+
+
+def oid_to_tuple(oid):
+    """Dotted OID string (leading or trailing dots allowed, e.g. '.1.3.6.1') or sequence of arcs -> tuple of ints"""
+    if isinstance(oid, str):
+        return tuple(int(arc) for arc in oid.strip('.').split('.'))
+    return tuple(oid)
+
+
+def _estimate_varbind_size(oid, value):
+    # BER overhead of a varbind is a few bytes per TLV; OCTET STRINGs dominate the rest
+    size = 6 + len(oid)
+    if hasattr(value, 'asOctets') and value.isValue:
+        size += len(value.asOctets())
+    else:
+        size += 6
+    return size
+
+
+class BulkSizer:
+    """
+    Adaptive max-repetitions for GETBULK.
+
+    Starts small and doubles the repetitions after every good response, capped
+    at the number of repetitions that fit in max_response_bytes at the average
+    varbind size seen so far. A repetition carries one varbind per requested
+    OID, so a table walk of N columns gets N varbinds per repetition. A tooBig
+    response or a timeout halves it and the request is retried, down to
+    minimum; after tooBig the halved value also becomes the new upper bound.
+    """
+
+    def __init__(self, initial=None, minimum=1, maximum=None, max_response_bytes=None):
+        """
+        Args:
+            initial (int): First max-repetitions (SNMP_BULK_INITIAL, default 10).
+            minimum (int): Smallest max-repetitions before an error is given up on.
+            maximum (int): Largest max-repetitions (SNMP_BULK_MAX_REPETITIONS, default 100).
+            max_response_bytes (int): Response size to stay under (SNMP_BULK_MAX_BYTES,
+                default 1400 so responses fit one unfragmented UDP datagram).
+        """
+        self.minimum = minimum
+        self.maximum = int(maximum or os.getenv("SNMP_BULK_MAX_REPETITIONS", 100))
+        self.max_response_bytes = int(max_response_bytes or os.getenv("SNMP_BULK_MAX_BYTES", 1400))
+        self.repetitions = min(self.maximum, int(initial or os.getenv("SNMP_BULK_INITIAL", 10)))
+        self.requests = 0
+        self.too_big_count = 0
+        self.timeout_count = 0
+        self._varbinds_seen = 0
+        self._bytes_seen = 0
+
+    def record_response(self, varbinds, per_repetition=1):
+        """
+        Grow max-repetitions after a good response, without overshooting the size budget.
+
+        Args:
+            varbinds (list): (oid, value) pairs of the response.
+            per_repetition (int): Varbinds per repetition, i.e. the number of OIDs requested.
+        """
+        self.requests += 1
+        if not varbinds:
+            return
+        self._varbinds_seen += len(varbinds)
+        self._bytes_seen += sum(_estimate_varbind_size(oid, value) for oid, value in varbinds)
+        average_size = self._bytes_seen / self._varbinds_seen
+        fits = max(self.minimum, int(self.max_response_bytes / (average_size * max(1, per_repetition))))
+        self.repetitions = max(self.minimum, min(self.maximum, fits, self.repetitions * 2))
+
+    def _shrink(self):
+        if self.repetitions <= self.minimum:
+            return False
+        self.repetitions = max(self.minimum, self.repetitions // 2)
+        return True
+
+    def too_big(self):
+        """Back off after a tooBig response and never grow back to that size; returns False at the minimum"""
+        self.too_big_count += 1
+        shrunk = self._shrink()
+        self.maximum = min(self.maximum, self.repetitions)
+        return shrunk
+
+    def timed_out(self):
+        """Back off after a timeout (large responses are the usual cause); returns False at the minimum"""
+        self.timeout_count += 1
+        return self._shrink()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'max_repetitions': self.repetitions,
+            'too_big': self.too_big_count,
+            'timeouts': self.timeout_count,
+        }
+
+
+async def bulk_walk(session, oid, sizer=None):
+    """
+    Async generator over the (oid, value) pairs of a subtree, fetched with GETBULK.
+
+    Args:
+        session (tuple): (SnmpEngine, CommunityData, transport, ContextData), as
+                         returned by snmp_session.get_snmp_session. SNMPv2c only.
+        oid (str | tuple): Root of the subtree to walk.
+        sizer (BulkSizer): Adaptive max-repetitions; a new one if not given.
+
+    Raises:
+        RuntimeError: on an error indication or error status from the agent.
+    """
+    snmp_engine, community_data, transport, context = session
+    sizer = sizer or BulkSizer()
+    root = oid_to_tuple(oid)
+    current = root
+
+    while True:
+        errorIndication, errorStatus, errorIndex, varBinds = await bulk_cmd(
+            snmp_engine,
+            community_data,
+            transport,
+            context,
+            0,
+            sizer.repetitions,
+            ObjectType(ObjectIdentity(ObjectName(current))),
+            lookupMib=False
+        )
+
+        if errorIndication:
+            if isinstance(errorIndication, errind.RequestTimedOut) and sizer.timed_out():
+                continue
+            raise RuntimeError(f"Error: {errorIndication}")
+        elif errorStatus:
+            if int(errorStatus) == TOO_BIG and sizer.too_big():
+                continue
+            raise RuntimeError(f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}")
+
+        sizer.record_response(varBinds)
+        if not varBinds:
+            return
+        for oid_val, value in varBinds:
+            oid_val = tuple(oid_val)
+            if oid_val[:len(root)] != root or isinstance(value, END_OF_WALK_TYPES):
+                return
+            yield oid_val, value
+        next_oid = tuple(varBinds[-1][0])
+        if next_oid <= current:
+            raise RuntimeError(f"Error: OID not increasing at {'.'.join([str(i) for i in next_oid])}")
+        current = next_oid
+
+
+async def next_walk(session, oid):
+    """Async generator over the (oid, value) pairs of a subtree, fetched with GETNEXT (SNMPv1 safe)"""
+    snmp_engine, community_data, transport, context = session
+    objects = walk_cmd(
+        snmp_engine,
+        community_data,
+        transport,
+        context,
+        ObjectType(ObjectIdentity(ObjectName(oid_to_tuple(oid)))),
+        lexicographicMode=False,
+        lookupMib=False
+    )
+    async for errorIndication, errorStatus, errorIndex, varBinds in objects:
+        if errorIndication:
+            raise RuntimeError(f"Error: {errorIndication}")
+        elif errorStatus:
+            raise RuntimeError(f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}")
+        for oid_val, value in varBinds:
+            yield tuple(oid_val), value
+
+
+def use_bulk(session, bulk=True):
+    # GETBULK does not exist in SNMPv1 (mpModel 0), so v1 targets always fall back to GETNEXT
+    return bulk and session[1].message_processing_model >= 1
+
+
+async def walk_oid(session, oid, bulk=False, sizer=None):
+    """
+    Async generator over a subtree: GETBULK with adaptive max-repetitions when
+    bulk is set and the target is SNMPv2c, GETNEXT otherwise.
+    """
+    if use_bulk(session, bulk):
+        async for oid_val, value in bulk_walk(session, oid, sizer):
+            yield oid_val, value
+    else:
+        async for oid_val, value in next_walk(session, oid):
+            yield oid_val, value
+
+
+async def _table_request(session, oids, bulk, sizer):
+    snmp_engine, community_data, transport, context = session
+    object_types = [ObjectType(ObjectIdentity(ObjectName(oid))) for oid in oids]
+    if bulk:
+        return await bulk_cmd(snmp_engine, community_data, transport, context, 0, sizer.repetitions, *object_types, lookupMib=False)
+    return await next_cmd(snmp_engine, community_data, transport, context, *object_types, lookupMib=False)
+
+
+async def walk_table(session, column_oids, bulk=False, sizer=None):
+    """
+    Walk several columns of the same table in lock-step and yield complete rows.
+
+    Every request carries the next OID of each unfinished column, so a single
+    GETNEXT round trip returns one cell per column (and a GETBULK round trip
+    max-repetitions of them). A row is yielded once every unfinished column has
+    moved past its index, so each row holds every column the agent has for it.
+
+    Args:
+        session (tuple): (SnmpEngine, CommunityData, transport, ContextData).
+        column_oids (list): Column OIDs (str or tuple) sharing an index.
+        bulk (bool): Use GETBULK on SNMPv2c targets; SNMPv1 always uses GETNEXT.
+        sizer (BulkSizer): Adaptive max-repetitions for GETBULK.
+
+    Yields:
+        tuple: (index_tuple, {column_oid: value}) in index order, where
+               column_oid is the OID as passed in column_oids.
+
+    Raises:
+        RuntimeError: on an error indication or error status from the agent.
+    """
+    bulk = use_bulk(session, bulk)
+    sizer = sizer or BulkSizer()
+    roots = {column: oid_to_tuple(column) for column in column_oids}
+    current = dict(roots)
+    active = list(column_oids)
+    rows = {}
+
+    def flush(limit=None):
+        # Rows up to the lowest active column's position can no longer gain cells
+        for index in sorted(rows):
+            if limit is not None and index > limit:
+                break
+            yield index, rows.pop(index)
+
+    while active:
+        errorIndication, errorStatus, errorIndex, varBinds = await _table_request(
+            session, [current[column] for column in active], bulk, sizer)
+
+        if errorIndication:
+            if bulk and isinstance(errorIndication, errind.RequestTimedOut) and sizer.timed_out():
+                continue
+            raise RuntimeError(f"Error: {errorIndication}")
+        elif errorStatus:
+            if bulk and int(errorStatus) == TOO_BIG and sizer.too_big():
+                continue
+            # SNMPv1 agents answer noSuchName for a column that ran off the end of the MIB
+            if not bulk and int(errorStatus) == NO_SUCH_NAME and errorIndex and int(errorIndex) <= len(active):
+                active.pop(int(errorIndex) - 1)
+                continue
+            raise RuntimeError(f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}")
+
+        if bulk:
+            sizer.record_response(varBinds, len(active))
+        if not varBinds:
+            break
+
+        # Responses are row-major: one varbind per requested column, repeated
+        requested = list(active)
+        finished = set()
+        for position, (oid_val, value) in enumerate(varBinds):
+            column = requested[position % len(requested)]
+            if column in finished:
+                continue
+            oid_val = tuple(oid_val)
+            root = roots[column]
+            if oid_val[:len(root)] != root or isinstance(value, END_OF_WALK_TYPES) or oid_val <= current[column]:
+                finished.add(column)
+                continue
+            current[column] = oid_val
+            rows.setdefault(oid_val[len(root):], {})[column] = value
+        active = [column for column in active if column not in finished]
+
+        if active:
+            lowest = min(current[column][len(roots[column]):] for column in active)
+            for row in flush(limit=lowest):
+                yield row
+
+    for row in flush():
+        yield row
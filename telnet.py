@@ -1,12 +1,16 @@
-import telnetlib
+import asyncio
 import time
 import re
 import argparse
+import json
 import os
+import queue
 from dotenv import load_dotenv
-from utils import insert_into_db_olt_customer_mac
+from utils import insert_into_db_olt_customer_mac, get_db_batch_size
+from db_pool import get_pool_stats, close_db_pool
 from enums import CDATA_GPON, VSOL_EPON, VSOL_GPON
-import io
+from telnet_session import TelnetSession
+import mac_parsers
 
 
 # Load environment variables from .env file
@@ -21,23 +25,31 @@ db_sid = os.getenv("DB_SID")
 # Regex to remove ANSI escape and cursor codes
 ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
+# Seconds a session waits before retrying a put into a full MAC queue
+QUEUE_FULL_WAIT = 0.01
+
 # ----------------- VENDOR COMMAND CONFIG -----------------
 
+# "disable_paging" is sent in enable mode before anything else; set it to None
+# for a vendor that has no such command and the pager is answered with SPACE.
 VENDOR_COMMANDS = {
     CDATA_GPON: {
         "enable": "enable",
+        "disable_paging": "screen-rows per-page 0",
         "config": "config",
         "show_mac": "show mac-address all",
         "pagination_text": "--More ( Press 'Q' to quit )--"
     },
     VSOL_EPON: {
         "enable": "enable",
+        "disable_paging": "terminal length 0",
         "config": "config",
         "show_mac": "show mac-address all",
         "pagination_text": "--More--"
     },
     VSOL_GPON: {
         "enable": "enable",
+        "disable_paging": "terminal length 0",
         "config": "configure terminal",
         "show_mac": "show mac address-table pon",
         "pagination_text": "--More--"
@@ -46,226 +58,254 @@ VENDOR_COMMANDS = {
 
 # ----------------- CORE TELNET FUNCTIONS -----------------
 
-def detect_prompt(tn):
-    tn.write(b"\n")
-    time.sleep(1)
-    response = tn.read_very_eager()
-    lines = response.strip().split(b"\n")
-    if lines:
-        last_line = lines[-1].strip()
-        if b">" in last_line:
-            prompt = last_line.split(b">")[0]
-            return prompt
-    raise ValueError("Failed to detect device prompt.")
-
-def flush_extra_output(tn):
-    tn.write(b"\n" * 3)
-    _ = tn.read_very_eager()
-    
-def clean_terminal_text(text):
-    cleaned_lines = []
-    for line in text.splitlines():
-        line = ansi_escape.sub('', line)
-        line = line.replace('\t', ' ')
-        line = re.sub(r'\s+', ' ', line)
-        cleaned_lines.append(line.strip())
-    return cleaned_lines  # <- return as list of lines
-
-def send_command_with_prompt_and_pagination(tn, command, prompt, more_prompt):
-    print(f"[+] Sending command: {command}")
-    flush_extra_output(tn)
-    time.sleep(1)
-    tn.write(command.encode('ascii') + b"\n")
-    output = b""
-    
-    more_prompt_bytes = more_prompt.encode("ascii")
-    prompt_bytes = prompt if isinstance(prompt, bytes) else prompt.encode("ascii")
-
-    while True:
-        chunk = tn.read_until(more_prompt_bytes, timeout=5)
-        output += chunk
-        if more_prompt_bytes in chunk:
-            print("[+] More data found, sending SPACE")
-            tn.write(b" ")
-        else:
-            remaining = tn.read_until(prompt_bytes, timeout=5)
-            output += remaining
-            break
-    return output.decode("utf-8", errors="ignore")
-
-# ----------------- PARSING PLACEHOLDER FUNCTIONS -----------------
-
-def parse_cdata_gpon(text):
-    mac_entries = []
-
-    # Skip lines before data starts
-    lines = text.strip().splitlines()
-    data_lines = [line for line in lines if re.match(r"\s*([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}", line)]
-
-    for line in data_lines:
-        # This regex handles flexible spacing and optional numeric fields
-        match = re.match(
-            r"\s*([0-9A-Fa-f:]{17})\s+"    # MAC
-            r"(\d+)\s+"                    # VLAN
-            r"(-|\d+)\s+"                  # Sport
-            r"(\S+)\s+"                    # Port
-            r"(-|\d+)\s+"                  # ONU
-            r"(-|\d+)\s+"                  # Gemid
-            r"(dynamic|static)",           # MAC-Type
-            line
-        )
-        if match:
-            mac, vlan, sport, port, onu, gemid, mac_type = match.groups()
-            formatted_port = f"{port}/{onu}" if onu != "-" else port
-            mac_entries.append({
-                "MAC": mac,
-                "VLAN": int(vlan),
-                "Port": formatted_port
-            })
-
-    return mac_entries
-
-def parse_vsol_gpon(text):
-    print("[+] Parsing MAC table for VSOL vendor...")
-
-    lines = clean_terminal_text(text)
-
-    mac_entries = []
-    combined_line = ''
-    fields_collected = 0
-
-    for line_num, line in enumerate(lines):
-        if re.match(r'^[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}$', line, re.IGNORECASE):
-            # Start of new MAC entry
-            if combined_line and fields_collected >= 6:
-                mac_entries.append(parse_combined_line(combined_line))
-            combined_line = line
-            fields_collected = 1
-        else:
-            combined_line += f' {line}'
-            fields_collected += 1
-
-    # Final pending entry
-    if combined_line and fields_collected >= 6:
-        mac_entries.append(parse_combined_line(combined_line))
-
-    print(f"[+] Parsed {len(mac_entries)} MAC entries.")
-    return mac_entries
-
-
-def parse_combined_line(line):
-    line_pattern = re.compile(
-        r"^([0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4})\s+"
-        r"(\d+)\s+\w+\s+(\S+)\s+\d+\s+\d+\s+\w+$",
-        re.IGNORECASE
-    )
-
-    match = line_pattern.match(line)
-    if match:
-        raw_mac, vlan, raw_port = match.groups()
-
-        clean_mac = raw_mac.replace('.', '').upper()
-        mac = ':'.join([clean_mac[i:i+2] for i in range(0, 12, 2)])
-
-        port = raw_port
-        port_match = re.match(r'\w+(\d+)/(\d+):(\d+)', raw_port)
-        if port_match:
-            port = f"{port_match.group(1)}/{port_match.group(2)}/{port_match.group(3)}"
-
-        return {
-            'MAC': mac,
-            'VLAN': int(vlan),
-            'Port': port
-        }
-
-
-
-def get_parser_for_vendor(vendor):
-    if vendor == CDATA_GPON:
-        return parse_cdata_gpon
-    elif vendor == VSOL_GPON:
-        return parse_vsol_gpon
-    else:
-        raise ValueError(f"Unsupported vendor: {vendor}")
+async def iter_command_lines(session, command, more_prompt, timeout=None):
+    """
+    Run a command on an open TelnetSession and yield its output line by line.
+
+    Lines are yielded as soon as they are complete, with ANSI sequences and
+    the pagination marker already removed; SPACE is sent whenever the pager
+    stops. Carriage returns split lines the way str.splitlines does, so a
+    page redraw (erase-line plus carriage return) cannot glue itself to the
+    next row. Blank lines are skipped. Only the current partial line is ever
+    held in memory.
+    """
+    print(f"[{session.host}] Sending command: {command}")
+    session.send_line(command)
+    more_pattern = re.compile(re.escape(more_prompt.encode("ascii")))
+    async for raw_line in session.read_lines(session.prompt_pattern(), more_pattern, timeout):
+        for line in raw_line.decode("utf-8", errors="ignore").split('\r'):
+            line = ansi_escape.sub('', line).replace(more_prompt, '')
+            if line.strip():
+                yield line
 
 # ----------------- MAIN LOGIC -----------------
 
+async def collect_mac_table(host, port, username, password, vendor, timeout=10, on_entries=None):
+    """
+    Log in to one OLT, fetch its MAC address table and parse it.
+
+    Args:
+        host (str): OLT IP address.
+        port (int): Telnet port.
+        username (str): Telnet username.
+        password (str): Telnet password, also sent if enable asks for one.
+        vendor (str): Key of VENDOR_COMMANDS.
+        timeout (int): Seconds to wait for any single prompt.
+        on_entries (callable): If given, called with each list of parsed entries
+                               as soon as the lines holding them have arrived.
+                               It may be a coroutine function; reading then
+                               waits for it, so a slow consumer holds the
+                               session back instead of buffering the table.
+
+    Returns:
+        list | int: MAC entries as returned by the vendor parser, or the number
+                    of entries passed to on_entries.
+    """
+    commands = VENDOR_COMMANDS[vendor]
+    parser = mac_parsers.MacTableParser(vendor)
+    collected = [] if on_entries is None else None
+    parsed_count = 0
+
+    async def emit(entries):
+        nonlocal parsed_count
+        if not entries:
+            return
+        parsed_count += len(entries)
+        if collected is not None:
+            collected.extend(entries)
+        elif asyncio.iscoroutinefunction(on_entries):
+            await on_entries(entries)
+        else:
+            on_entries(entries)
+
+    print(f"[{host}] Connecting to {host}:{port} ...")
+    async with TelnetSession(host, port, timeout=timeout) as session:
+        prompt = await session.login(username, password)
+        print(f"[{host}] Detected prompt: {prompt.decode(errors='ignore')}")
+
+        await session.enable(commands["enable"], password)
+        print(f"[{host}] Entered enable mode.")
+        if commands.get("disable_paging"):
+            # The table then arrives in one continuous read; if the CLI rejects the
+            # command, the reader still answers every pagination prompt with SPACE
+            if await session.try_command(commands["disable_paging"]):
+                print(f"[{host}] Pagination disabled with '{commands['disable_paging']}'.")
+            else:
+                print(f"[{host}] '{commands['disable_paging']}' was rejected, paging with SPACE.")
+        await session.command(commands["config"])
+        print(f"[{host}] Entered config mode.")
+
+        async for line in iter_command_lines(session, commands["show_mac"], commands["pagination_text"]):
+            await emit(parser.feed(line))
+        if session.more_prompts:
+            print(f"[{host}] Answered {session.more_prompts} pagination prompts.")
+    await emit(parser.close())
+
+    return collected if on_entries is None else parsed_count
+
+def load_inventory(inventory_file):
+    """
+    Read the telnet inventory.
+
+    The file is a JSON object with per-vendor credentials and a device list, e.g.
+        {"credentials": {"CDATA-GPON": {"username": "admin", "password": "secret"}},
+         "devices": [{"ip": "10.0.0.1", "vendor": "CDATA-GPON", "port": 23}]}
+    port (23) is optional; a device may set its own username and password.
+
+    Returns:
+        list: Device dicts with ip, port, vendor, username and password.
+    """
+    with open(inventory_file) as f:
+        inventory = json.load(f)
+
+    credentials = {vendor.upper(): creds for vendor, creds in inventory.get('credentials', {}).items()}
+    devices = []
+    for entry in inventory.get('devices', []):
+        vendor = entry.get('vendor', '').upper()
+        # VSOL-EPON has CLI commands but no MAC-table parser yet, so reject it before connecting
+        if vendor not in VENDOR_COMMANDS or vendor not in mac_parsers.SUPPORTED_VENDORS:
+            raise ValueError(f"Unsupported vendor for {entry.get('ip')}: {entry.get('vendor')}")
+        vendor_creds = credentials.get(vendor, {})
+        username = entry.get('username', vendor_creds.get('username'))
+        password = entry.get('password', vendor_creds.get('password'))
+        if not entry.get('ip') or not username or password is None:
+            raise ValueError(f"Inventory entry needs ip and credentials for {vendor}: {entry.get('ip')}")
+        devices.append({
+            'ip': entry['ip'],
+            'port': int(entry.get('port', 23)),
+            'vendor': vendor,
+            'username': username,
+            'password': password,
+        })
+    return devices
+
+async def collect_and_store(device, semaphore, args):
+    """
+    Collect one device under the concurrency limit and stream its entries into OLT_CUSTOMER_MAC.
+
+    Entries go through a queue to insert_into_db_olt_customer_mac, which runs
+    in a worker thread and writes batches while the table is still being read.
+    The queue holds at most two DB batches (DB_BATCH_SIZE); once it is full the
+    session waits for the loader, and if the loader stops early (e.g. on a
+    database error) the session is abandoned instead of buffering the table.
+    If the device fails or misses its deadline, batches already committed stay
+    and the one being filled is discarded.
+    """
+    host = device['ip']
+    entries_queue = None if args.dry_run else queue.Queue(maxsize=2 * get_db_batch_size())
+    loader = None
+
+    async def put(item):
+        # Never block the event loop on a full queue: the other sessions share it
+        while True:
+            if loader.done():
+                raise RuntimeError("MAC loader stopped before the table was read")
+            try:
+                entries_queue.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(QUEUE_FULL_WAIT)
+
+    async def on_entries(entries):
+        if args.debug:
+            for entry in entries:
+                print(entry)
+        if entries_queue is not None:
+            for entry in entries:
+                await put(entry)
+
+    def queued_entries():
+        while True:
+            entry = entries_queue.get()
+            if entry is None:
+                return
+            if isinstance(entry, Exception):
+                raise entry
+            yield entry
+
+    async with semaphore:
+        if entries_queue is not None:
+            # The Oracle client blocks, so the loader runs in a worker thread while sessions continue
+            loader = asyncio.create_task(asyncio.to_thread(
+                insert_into_db_olt_customer_mac, queued_entries(), host, db_host, db_port, db_user, db_pass, db_sid,
+                append_values=args.direct_path))
+
+        start_time = time.time()
+        try:
+            entry_count = await asyncio.wait_for(
+                collect_mac_table(host, device['port'], device['username'], device['password'], device['vendor'],
+                                  on_entries=on_entries),
+                timeout=args.deadline)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = RuntimeError(f"Deadline of {args.deadline} seconds exceeded")
+            print(f"[{host}] Unexpected error occurred.")
+            print(f"[{host}] Details: {e}")
+            if loader is not None:
+                try:
+                    await put(e)
+                except RuntimeError:
+                    pass  # The loader already stopped
+                await asyncio.gather(loader, return_exceptions=True)
+            return False
+        elapsed_time = time.time() - start_time
+
+        rate = entry_count / elapsed_time if elapsed_time > 0 else float(entry_count)
+        print(f"[{host}] Collected {entry_count} MAC entries in {elapsed_time:.2f} seconds ({rate:.0f} entries/s).")
+
+        if loader is None:
+            print(f"[{host}] Dry run mode: Data not inserted into database")
+            return True
+        try:
+            await put(None)
+        except RuntimeError:
+            pass  # The loader already finished; its result says how
+        try:
+            return await loader
+        except Exception as e:
+            print(f"[{host}] Failed to load MAC entries: {e}")
+            return False
+
+async def run(devices, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    start_time = time.time()
+    results = await asyncio.gather(*[collect_and_store(device, semaphore, args) for device in devices])
+    print(f"[+] Collected {sum(results)}/{len(devices)} devices in {time.time() - start_time:.2f} seconds "
+          f"(concurrency {args.concurrency}).")
+    if not args.dry_run:
+        print(f"DB pool stats: {get_pool_stats()}")
+        close_db_pool()
+
 def main():
     parser = argparse.ArgumentParser(description="Telnet MAC Address Table Fetcher")
-    parser.add_argument("-i", required=True, help="Target device IP address")
+    parser.add_argument("-i", nargs="+", help="Target device IP address (several share the same credentials)")
     parser.add_argument("-p", type=int, default=23, help="Telnet port (default: 23)")
-    parser.add_argument("-u", required=True, help="Username for telnet login")
-    parser.add_argument("-ps", required=True, help="Password for telnet login")
-    parser.add_argument("-v", "--vendor", required=True, help="Vendor identifier (e.g., CDATA-GPON, VSOL-EPON, VSOL-GPON)")
+    parser.add_argument("-u", help="Username for telnet login")
+    parser.add_argument("-ps", help="Password for telnet login")
+    parser.add_argument("-v", "--vendor", help=f"Vendor identifier ({', '.join(mac_parsers.SUPPORTED_VENDORS)})")
+    parser.add_argument("--inventory", help="JSON inventory of OLTs with per-vendor credentials (replaces -i/-u/-ps/-v)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("TELNET_CONCURRENCY", 10)),
+                        help="Maximum devices collected at the same time (default: TELNET_CONCURRENCY or 10)")
+    parser.add_argument("--deadline", type=float, default=float(os.getenv("TELNET_DEADLINE", 300)),
+                        help="Seconds allowed per device, login to last page (default: TELNET_DEADLINE or 300)")
     parser.add_argument('-d', '--dry-run', action='store_true', help='Parse data but do not insert into database')
+    parser.add_argument('--direct-path', action='store_true', help='Load the MAC table with the APPEND_VALUES direct-path hint')
+    parser.add_argument('--debug', action='store_true', help='Print every parsed MAC entry')
 
     args = parser.parse_args()
-    HOST = args.i
-    PORT = args.p
-    USERNAME = args.u
-    PASSWORD = args.ps
-    VENDOR = args.vendor.upper()
-
-    if VENDOR not in VENDOR_COMMANDS:
-        print(f"[-] Vendor '{VENDOR}' not supported.")
-        return
-
-    commands = VENDOR_COMMANDS[VENDOR]
-    parse_function = get_parser_for_vendor(VENDOR)
-
-    try:
-        print(f"[+] Connecting to {HOST}:{PORT} ...")
-        tn = telnetlib.Telnet(HOST, PORT, timeout=10)
-        print("[+] Connected.")
-
-        print("[+] Waiting for username prompt...")
-        tn.read_until(b"Username:", timeout=5)
-        tn.write(USERNAME.encode("ascii") + b"\n")
-
-        print("[+] Waiting for password prompt...")
-        tn.read_until(b"Password:", timeout=5)
-        tn.write(PASSWORD.encode("ascii") + b"\n")
-
-        time.sleep(1)
-        prompt = detect_prompt(tn)
-        print(f"[+] Detected prompt: {prompt.decode()}")
-
-        flush_extra_output(tn)
-
-        # Enable mode
-        tn.write(commands["enable"].encode("ascii") + b"\n")
-        time.sleep(1)
-        
-        tn.write(PASSWORD.encode("ascii") + b"\n")
-        print("[+] Entering enable mode...")
-        time.sleep(1)
-        flush_extra_output(tn)
-
-        # Config mode (if needed)
-        tn.write(commands["config"].encode("ascii") + b"\n")
-        print("[+] Entering config mode...")
-        time.sleep(1)
-        flush_extra_output(tn)
-
-        # Show MAC table
-        output = send_command_with_prompt_and_pagination(tn, commands["show_mac"], prompt, commands["pagination_text"])
-
-        # Parse based on vendor
-        parsed_output = parse_function(output)
-        for entry in parsed_output:
-            print(entry)
-
-        tn.close()
-
-        if not args.dry_run:
-            insert_into_db_olt_customer_mac(parsed_output, HOST, db_host, db_port, db_user, db_pass, db_sid)
-        else:
-            print("Dry run mode: Data not inserted into database")
 
-    except Exception as e:
-        print("[-] Unexpected error occurred.")
-        print(f"[-] Details: {e}")
+    if args.inventory:
+        devices = load_inventory(args.inventory)
+    else:
+        if not (args.i and args.u and args.ps and args.vendor):
+            parser.error("-i, -u, -ps and -v are required without --inventory")
+        vendor = args.vendor.upper()
+        if vendor not in VENDOR_COMMANDS or vendor not in mac_parsers.SUPPORTED_VENDORS:
+            print(f"[-] Vendor '{vendor}' not supported.")
+            return
+        devices = [{'ip': host, 'port': args.p, 'vendor': vendor, 'username': args.u, 'password': args.ps} for host in args.i]
+
+    asyncio.run(run(devices, args))
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,229 @@
+# telnet_session.py
+import asyncio
+import re
+
+# Telnet protocol bytes (RFC 854)
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+
+# Options we let the server enable: echo and suppress-go-ahead (character mode CLI)
+ECHO = 1
+SGA = 3
+ACCEPTED_OPTIONS = (ECHO, SGA)
+
+LOGIN_PATTERN = re.compile(rb'(?:[Uu]sername|[Ll]ogin):\s*$')
+PASSWORD_PATTERN = re.compile(rb'[Pp]assword:\s*$')
+# Hostname followed by '>' (user mode) or '#' (enable/config mode), possibly with "(config)" etc.
+PROMPT_PATTERN = re.compile(rb'(?:^|[\r\n])([^\r\n>#]*?)(?:\([^\r\n)]*\))?[>#] ?$')
+# How OLT CLIs reject a command: "% Unknown command", "Invalid input", a caret under the bad word, ...
+CLI_ERROR_PATTERN = re.compile(rb'%\s*\w|[Uu]nknown|[Ii]nvalid|[Ii]ncomplete|[Uu]nrecognized|[Ee]rror|^\s*\^\s*$', re.MULTILINE)
+
+
+class TelnetSession:
+    """
+    Minimal asyncio telnet client for OLT CLIs.
+
+    Reads are driven by the patterns the caller waits for (login, password and
+    CLI prompts, pagination markers) instead of fixed sleeps, so a session
+    spends no idle time and many sessions can run concurrently in one loop.
+    Telnet option negotiation is answered inline: ECHO and SGA are accepted,
+    everything else is refused.
+    """
+
+    def __init__(self, host, port=23, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.prompt = None
+        self._reader = None
+        self._writer = None
+        self._buffer = bytearray()
+        self._iac_state = None
+        self._sub_negotiation = False
+        self.more_prompts = 0
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout)
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self._writer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _negotiate(self, command, option):
+        if command in (DO, DONT):
+            reply = WILL if command == DO and option in ACCEPTED_OPTIONS else WONT
+        else:
+            reply = DO if command == WILL and option in ACCEPTED_OPTIONS else DONT
+        self._writer.write(bytes([IAC, reply, option]))
+
+    def _strip_telnet(self, data):
+        """Remove telnet commands from raw socket data, answering negotiations as they appear"""
+        out = bytearray()
+        for byte in data:
+            state = self._iac_state
+            if state is None:
+                if byte == IAC:
+                    self._iac_state = IAC
+                elif not self._sub_negotiation:
+                    out.append(byte)
+            elif state == IAC:
+                if byte == IAC:
+                    if not self._sub_negotiation:
+                        out.append(IAC)
+                    self._iac_state = None
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._iac_state = byte
+                elif byte == SB:
+                    self._sub_negotiation = True
+                    self._iac_state = None
+                elif byte == SE:
+                    self._sub_negotiation = False
+                    self._iac_state = None
+                else:
+                    self._iac_state = None
+            else:
+                self._negotiate(state, byte)
+                self._iac_state = None
+        return bytes(out)
+
+    async def read_chunk(self, timeout=None):
+        """Read whatever the server sends next, without telnet commands; b'' on EOF"""
+        while True:
+            data = await asyncio.wait_for(self._reader.read(65536), timeout=timeout or self.timeout)
+            if not data:
+                return b''
+            data = self._strip_telnet(data)
+            if data:
+                return data
+
+    async def expect(self, patterns, timeout=None):
+        """
+        Read until one of the compiled byte patterns matches the buffered output.
+
+        Returns:
+            tuple: (pattern index, match, output up to and including the match).
+        Raises:
+            asyncio.TimeoutError: if nothing matches within timeout seconds.
+            ConnectionError: if the server closed the connection first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        while True:
+            for i, pattern in enumerate(patterns):
+                match = pattern.search(self._buffer)
+                if match:
+                    output = bytes(self._buffer[:match.end()])
+                    del self._buffer[:match.end()]
+                    # The match refers to the buffer just trimmed, so return one over the copied output
+                    return i, pattern.match(output, match.start()), output
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Timed out waiting for {[p.pattern for p in patterns]} from {self.host}")
+            chunk = await self.read_chunk(timeout=remaining)
+            if not chunk:
+                raise ConnectionError(f"Connection closed by {self.host}")
+            self._buffer += chunk
+
+    async def read_lines(self, end_pattern, more_pattern=None, timeout=None):
+        """
+        Async generator over the complete lines of a command's output, as raw bytes without the newline.
+
+        Only the current partial line is buffered, so memory stays bounded
+        however long the output is. A more_pattern match in the partial line
+        (a pager waiting for a key) is removed and answered with SPACE; the
+        output ends when end_pattern (normally the CLI prompt) matches it.
+
+        Raises:
+            asyncio.TimeoutError: if no data arrives within timeout seconds.
+            ConnectionError: if the server closed the connection first.
+        """
+        while True:
+            end = self._buffer.rfind(b'\n')
+            if end >= 0:
+                lines = bytes(self._buffer[:end]).split(b'\n')
+                del self._buffer[:end + 1]
+                for line in lines:
+                    yield line
+            if more_pattern is not None:
+                match = more_pattern.search(self._buffer)
+                if match:
+                    del self._buffer[match.start():match.end()]
+                    self.more_prompts += 1
+                    self.write(b" ")
+            match = end_pattern.search(self._buffer)
+            if match:
+                del self._buffer[:match.end()]
+                return
+            chunk = await self.read_chunk(timeout)
+            if not chunk:
+                raise ConnectionError(f"Connection closed by {self.host}")
+            self._buffer += chunk
+
+    def write(self, text):
+        data = text.encode('ascii') if isinstance(text, str) else text
+        # A literal 0xFF must be doubled on the wire
+        self._writer.write(data.replace(bytes([IAC]), bytes([IAC, IAC])))
+
+    def send_line(self, text):
+        self.write(text + "\n")
+
+    async def login(self, username, password):
+        """Answer the login and password prompts and wait for the first CLI prompt"""
+        await self.expect([LOGIN_PATTERN])
+        self.send_line(username)
+        await self.expect([PASSWORD_PATTERN])
+        self.send_line(password)
+        _, match, _ = await self.expect([PROMPT_PATTERN])
+        self.prompt = match.group(1).strip()
+        return self.prompt
+
+    def prompt_pattern(self):
+        """Pattern for this device's CLI prompt in any mode (>, #, (config)#)"""
+        return re.compile(rb'(?:^|[\r\n])' + re.escape(self.prompt) + rb'(?:\([^\r\n)]*\))?[>#] ?$')
+
+    async def command(self, command, timeout=None):
+        """Send a command and return its output once the prompt is back"""
+        self.send_line(command)
+        _, _, output = await self.expect([self.prompt_pattern()], timeout)
+        return output
+
+    async def try_command(self, command, timeout=None):
+        """
+        Send a command and report whether the CLI accepted it.
+
+        Returns:
+            bool: False if the output before the prompt looks like a CLI error.
+        """
+        output = await self.command(command, timeout)
+        # Drop the echo of the command itself (a word like "error" in it is not a rejection), wherever
+        # it is; devices that do not echo, or print the error on the echo's line, are still checked
+        response = output.replace(command.encode('ascii'), b"", 1)
+        # The trailing prompt is not part of the response either
+        response = self.prompt_pattern().sub(b"", response)
+        return not CLI_ERROR_PATTERN.search(response)
+
+    async def enable(self, enable_command, password):
+        """Enter privileged mode, answering a password prompt only if the device asks for one"""
+        self.send_line(enable_command)
+        index, _, _ = await self.expect([PASSWORD_PATTERN, self.prompt_pattern()])
+        if index == 0:
+            self.send_line(password)
+            await self.expect([self.prompt_pattern()])
@@ -0,0 +1,32 @@
+import pytest
+
+# helper imports utils, which needs the Oracle client
+pytest.importorskip("cx_Oracle")
+from helper import pack_get_requests
+
+OID = '1.3.6.1.4.1.17409.2.3.4.1.1.7'
+
+
+def _oids(count):
+    return [(i, f'{OID}.{i}') for i in range(count)]
+
+
+def test_every_oid_is_sent_once_in_order():
+    oids = _oids(100)
+    pdus = pack_get_requests(oids, 40, 100000)
+    assert [len(pdu) for pdu in pdus] == [40, 40, 20]
+    assert [item for pdu in pdus for item in pdu] == oids
+
+
+def test_estimated_response_size_bounds_a_pdu():
+    # Each varbind is estimated at its 15 arcs plus 40 bytes
+    pdus = pack_get_requests(_oids(100), 1000, 550)
+    assert [len(pdu) for pdu in pdus] == [10] * 10
+
+
+def test_a_varbind_larger_than_the_budget_still_gets_a_pdu():
+    assert pack_get_requests(_oids(2), 40, 1) == [[oid] for oid in _oids(2)]
+
+
+def test_no_oids():
+    assert pack_get_requests([], 40, 1400) == []
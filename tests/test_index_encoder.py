@@ -0,0 +1,21 @@
+import pytest
+from index_encoder import expand_interface_strings
+
+
+def test_single_interface_is_kept():
+    assert expand_interface_strings("epon0/0/1/24") == ["epon0/0/1/24"]
+
+
+def test_range_and_list_are_expanded_in_order():
+    assert expand_interface_strings("gpon0/2/4/1..3, epon0/0/2/9") == [
+        "gpon0/2/4/1", "gpon0/2/4/2", "gpon0/2/4/3", "epon0/0/2/9"]
+
+
+def test_single_value_range():
+    assert expand_interface_strings("gpon0/2/4/5..5") == ["gpon0/2/4/5"]
+
+
+@pytest.mark.parametrize('spec', ["gpon0/2/4/9..1", "xpon0/2/4/1", "gpon0/2/4", "gpon0/2/4/1..", ""])
+def test_invalid_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        expand_interface_strings(spec)
@@ -0,0 +1,80 @@
+import pytest
+from enums import CDATA_GPON, VSOL_EPON, VSOL_GPON
+from mac_parsers import (MacTableParser, parse_mac_table, synthetic_cdata_table, synthetic_vsol_table,
+                         _reference_cdata_gpon, _reference_vsol_gpon)
+
+# Command output as telnet.iter_command_lines passes it on: the echo first, no closing prompt
+CDATA_OUTPUT = """show mac address-table pon
+MAC               VLAN  Sport  Port       ONU  Gemid  MAC-Type
+00:1A:2B:3C:4D:5E  100   -      gpon0/1    12   3      dynamic
+00:1A:2B:3C:4D:5F  200   -      gpon0/2    -    -      static
+\x1b[2K\r00:1A:2B:3C:4D:60  300   1      gpon0/3    7    9      dynamic
+Total: 3
+"""
+
+# VSOL wraps every row over several lines, and a page redraw can split a row (the pager
+# marker and the closing prompt are removed by telnet.iter_command_lines before parsing)
+VSOL_OUTPUT = """Mac Address     Vlan  Type     Port        Vport  Gemport  Status
+001a.2b3c.4d5e
+100
+Dynamic
+GPON0/1:12
+1
+3
+Active
+001a.2b3c.4d5f 200 Dynamic
+\x1b[2K\rGPON0/2:5 1 4 Active
+"""
+
+
+def _feed(vendor, text):
+    parser = MacTableParser(vendor)
+    entries = []
+    for line in text.splitlines():
+        entries.extend(parser.feed(line))
+    entries.extend(parser.close())
+    return entries
+
+
+def test_cdata_rows():
+    assert parse_mac_table(CDATA_OUTPUT, CDATA_GPON) == [
+        {'MAC': '00:1A:2B:3C:4D:5E', 'VLAN': 100, 'Port': 'gpon0/1/12'},
+        {'MAC': '00:1A:2B:3C:4D:5F', 'VLAN': 200, 'Port': 'gpon0/2'},
+        {'MAC': '00:1A:2B:3C:4D:60', 'VLAN': 300, 'Port': 'gpon0/3/7'},
+    ]
+
+
+def test_vsol_wrapped_rows():
+    assert parse_mac_table(VSOL_OUTPUT, VSOL_GPON) == [
+        {'MAC': '00:1A:2B:3C:4D:5E', 'VLAN': 100, 'Port': '0/1/12'},
+        {'MAC': '00:1A:2B:3C:4D:5F', 'VLAN': 200, 'Port': '0/2/5'},
+    ]
+
+
+@pytest.mark.parametrize('vendor, text', [(CDATA_GPON, CDATA_OUTPUT), (VSOL_GPON, VSOL_OUTPUT)])
+def test_line_parser_matches_whole_text_parser(vendor, text):
+    assert _feed(vendor, text) == parse_mac_table(text, vendor)
+
+
+@pytest.mark.parametrize('vendor, table, reference', [
+    (CDATA_GPON, synthetic_cdata_table, _reference_cdata_gpon),
+    (VSOL_GPON, synthetic_vsol_table, _reference_vsol_gpon),
+])
+def test_parsers_match_the_reference_parsers(vendor, table, reference):
+    text = table(2000)
+    expected = reference(text)
+    assert len(expected) == 2000
+    assert parse_mac_table(text, vendor) == expected
+    assert _feed(vendor, text) == expected
+
+
+def test_incomplete_vsol_row_is_dropped():
+    text = "001a.2b3c.4d5e\n100\nDynamic\n001a.2b3c.4d5f 200 Dynamic GPON0/2:5 1 4 Active"
+    assert _feed(VSOL_GPON, text) == [{'MAC': '00:1A:2B:3C:4D:5F', 'VLAN': 200, 'Port': '0/2/5'}]
+
+
+def test_unsupported_vendor():
+    with pytest.raises(ValueError):
+        MacTableParser(VSOL_EPON)
+    with pytest.raises(ValueError):
+        parse_mac_table("", VSOL_EPON)
@@ -0,0 +1,68 @@
+from oid_resolver import OidResolver, VarBindRecord
+
+IF_DESCR = (1, 3, 6, 1, 2, 1, 2, 2, 1, 2)
+OID_TABLE = {
+    (1, 3, 6, 1, 2, 1, 2): ('IF-MIB', 'interfaces', None),
+    (1, 3, 6, 1, 2, 1, 2, 2, 1): ('IF-MIB', 'ifEntry', None),
+    IF_DESCR: ('IF-MIB', 'ifDescr', 'DisplayString'),
+}
+
+
+def test_resolves_column_and_index():
+    resolver = OidResolver(OID_TABLE)
+    assert resolver.resolve(IF_DESCR + (7,)) == 'IF-MIB::ifDescr.7'
+    record = resolver.resolve_record(IF_DESCR + (7, 1), 'eth0')
+    assert record == VarBindRecord(IF_DESCR + (7, 1), 'IF-MIB', 'ifDescr', (7, 1), 'eth0')
+
+
+def test_longest_prefix_wins_and_unknown_oids_stay_numeric():
+    resolver = OidResolver(OID_TABLE)
+    assert resolver.resolve((1, 3, 6, 1, 2, 1, 2, 9)) == 'IF-MIB::interfaces.9'
+    assert resolver.resolve((1, 3, 6, 1, 4, 1)) == '1.3.6.1.4.1'
+    record = resolver.resolve_record((1, 3, 6, 1, 4, 1), None)
+    assert (record.module, record.symbol, record.index) == (None, '1.3.6.1.4.1', ())
+
+
+def test_first_entry_for_an_oid_is_kept():
+    resolver = OidResolver(OID_TABLE)
+    resolver.add(IF_DESCR, ('OTHER-MIB', 'other', 'OctetString'))
+    assert resolver.resolve(IF_DESCR + (1,)) == 'IF-MIB::ifDescr.1'
+    assert resolver.size == len(OID_TABLE)
+
+
+def test_column_cache_skips_the_trie_for_the_rest_of_a_column():
+    resolver = OidResolver(OID_TABLE)
+    for index in range(1, 11):
+        resolver.resolve(IF_DESCR + (index,))
+    assert (resolver.cache_misses, resolver.cache_hits) == (1, 9)
+
+
+def test_non_leaf_objects_are_not_cached():
+    resolver = OidResolver(OID_TABLE)
+    resolver.resolve((1, 3, 6, 1, 2, 1, 2, 9))
+    resolver.resolve((1, 3, 6, 1, 2, 1, 2, 9))
+    assert resolver.cache_hits == 0
+
+
+def test_column_cache_is_bounded():
+    table = {(1, 3, 6, 1, 9, column): ('TEST-MIB', f'col{column}', 'Integer32') for column in range(10)}
+    resolver = OidResolver(table, column_cache_size=3)
+    for column in range(10):
+        resolver.resolve((1, 3, 6, 1, 9, column, 1))
+    assert len(resolver._column_cache) == 3
+
+
+def test_miss_handler_can_add_entries_and_the_lookup_is_retried():
+    calls = []
+
+    def miss_handler(oid, entry):
+        calls.append(oid)
+        if entry is None:
+            resolver.update({(1, 3, 6, 1, 4, 1, 99): ('VENDOR-MIB', 'vendorThing', 'Integer32')})
+            return True
+        return False
+
+    resolver = OidResolver(miss_handler=miss_handler)
+    assert resolver.resolve((1, 3, 6, 1, 4, 1, 99, 0)) == 'VENDOR-MIB::vendorThing.0'
+    assert resolver.resolve((1, 3, 6, 1, 4, 1, 99, 1)) == 'VENDOR-MIB::vendorThing.1'
+    assert len(calls) == 1
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from onu_state import diff_onu_data, next_onu_state, onu_changed, load_onu_state, save_onu_state, summarize_diff
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _onu(**fields):
+    onu = {'IFINDEX': 1, 'MAC': 'AA:BB:CC:DD:EE:FF', 'STATUS': 1, 'SLNO': 'SN1', 'POWER': -20.0,
+           'DISTANCE': 1200, 'UP_SINCE': NOW}
+    onu.update(fields)
+    return onu
+
+
+def test_identical_onu_is_unchanged():
+    assert not onu_changed(_onu(), _onu())
+
+
+def test_exact_fields_are_compared_exactly():
+    assert onu_changed(_onu(), _onu(STATUS=2))
+    assert onu_changed(_onu(), _onu(MAC='AA:BB:CC:DD:EE:00'))
+
+
+def test_power_inside_deadband_is_ignored():
+    assert not onu_changed(_onu(), _onu(POWER=-20.5), power_deadband=0.5)
+    assert onu_changed(_onu(), _onu(POWER=-20.51), power_deadband=0.5)
+
+
+def test_power_appearing_or_disappearing_is_a_change():
+    assert onu_changed(_onu(POWER=None), _onu())
+    assert onu_changed(_onu(), _onu(POWER=None))
+    assert not onu_changed(_onu(POWER=None), _onu(POWER=None))
+
+
+def test_distance_deadband():
+    assert onu_changed(_onu(), _onu(DISTANCE=1201))
+    assert not onu_changed(_onu(), _onu(DISTANCE=1205), distance_deadband=5)
+
+
+def test_up_since_jitter_is_ignored_but_reregistration_is_not():
+    assert not onu_changed(_onu(), _onu(UP_SINCE=NOW + timedelta(seconds=30)))
+    assert onu_changed(_onu(), _onu(UP_SINCE=NOW + timedelta(minutes=10)))
+
+
+def test_diff_classifies_every_onu():
+    previous = {'1': _onu(), '2': _onu(IFINDEX=2), '3': _onu(IFINDEX=3)}
+    current = {'1': _onu(POWER=-20.1), '2': _onu(IFINDEX=2, STATUS=2), '4': _onu(IFINDEX=4)}
+    diff = diff_onu_data(previous, current)
+    assert list(diff['unchanged']) == ['1']
+    assert list(diff['changed']) == ['2']
+    assert list(diff['new']) == ['4']
+    assert diff['removed'] == {'3': previous['3']}
+    assert summarize_diff(diff) == "1 new, 1 changed, 1 removed, 1 unchanged"
+
+
+def test_next_state_keeps_written_values_so_drift_adds_up():
+    previous = {'1': _onu(POWER=-20.0)}
+    state = previous
+    # Each poll drifts 0.3 dBm: inside the deadband against the last poll, but not against what was written
+    for power, expected in [(-20.3, 'unchanged'), (-20.6, 'changed')]:
+        diff = diff_onu_data(state, {'1': _onu(POWER=power)})
+        assert list(diff[expected]) == ['1']
+        state = next_onu_state(state, diff)
+    assert state['1']['POWER'] == -20.6
+
+
+def test_next_state_drops_removed_onus():
+    previous = {'1': _onu(), '2': _onu(IFINDEX=2)}
+    diff = diff_onu_data(previous, {'1': _onu()})
+    assert list(next_onu_state(previous, diff)) == ['1']
+
+
+def test_state_round_trip(tmp_path):
+    assert load_onu_state('10.0.0.1', str(tmp_path)) == {}
+    save_onu_state('10.0.0.1', {'1': _onu()}, str(tmp_path))
+    assert load_onu_state('10.0.0.1', str(tmp_path)) == {'1': _onu()}
+
+
+def test_corrupt_state_reads_as_empty(tmp_path):
+    (tmp_path / '10.0.0.1.pickle').write_bytes(b'not a pickle')
+    assert load_onu_state('10.0.0.1', str(tmp_path)) == {}
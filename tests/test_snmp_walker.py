@@ -0,0 +1,58 @@
+import asyncio
+from pysnmp.hlapi.v3arch.asyncio import CommunityData
+from pysnmp.proto.rfc1902 import OctetString
+from pysnmp.proto.rfc1905 import EndOfMibView
+import snmp_walker
+from snmp_walker import BulkSizer, oid_to_tuple, walk_table, _estimate_varbind_size
+
+COLUMNS = ['1.3.6.1.4.1.99.1.1', '1.3.6.1.4.1.99.1.2', '1.3.6.1.4.1.99.1.3', '1.3.6.1.4.1.99.1.4']
+ROWS = 500
+MAX_BYTES = 1400
+
+
+def _fake_agent(responses):
+    # GETBULK over a table of ROWS rows with a 20-byte string in every cell, recording each response's size
+    async def table_request(session, oids, bulk, sizer):
+        varbinds = []
+        for _ in range(sizer.repetitions):
+            for position, oid in enumerate(oids):
+                column = oid_to_tuple(COLUMNS[position])
+                row = oid[len(column)] + 1 if len(oid) > len(column) else 1
+                if row > ROWS:
+                    varbinds.append((oid, EndOfMibView()))
+                else:
+                    varbinds.append((column + (row,), OctetString(b'x' * 20)))
+            oids = [oid for oid, _ in varbinds[-len(oids):]]
+        responses.append(sum(_estimate_varbind_size(oid, value) for oid, value in varbinds))
+        return None, 0, 0, varbinds
+    return table_request
+
+
+def test_oid_to_tuple_strips_dots():
+    assert oid_to_tuple('.1.3.6.1.2.1.') == (1, 3, 6, 1, 2, 1)
+    assert oid_to_tuple((1, 3, 6)) == (1, 3, 6)
+
+
+def test_record_response_counts_varbinds_per_repetition():
+    sizer = BulkSizer(initial=10, maximum=1000, max_response_bytes=MAX_BYTES)
+    varbinds = [((1, 3, 6, 1, 4, 1, 99, 1, column, 1), OctetString(b'x' * 20)) for column in range(4)] * 10
+    average_size = _estimate_varbind_size(*varbinds[0])
+    for _ in range(10):
+        sizer.record_response(varbinds, len(COLUMNS))
+    assert sizer.repetitions * len(COLUMNS) * average_size <= MAX_BYTES
+
+
+def test_walk_table_stays_within_byte_budget(monkeypatch):
+    responses = []
+    monkeypatch.setattr(snmp_walker, '_table_request', _fake_agent(responses))
+    session = (None, CommunityData('public', mpModel=1), None, None)
+    sizer = BulkSizer(initial=10, maximum=1000, max_response_bytes=MAX_BYTES)
+
+    async def walk():
+        return [row async for row in walk_table(session, COLUMNS, bulk=True, sizer=sizer)]
+
+    rows = asyncio.run(walk())
+    assert len(rows) == ROWS
+    assert all(len(cells) == len(COLUMNS) for _, cells in rows)
+    # The first request uses the initial repetitions; every one sized from measurements must fit
+    assert max(responses[1:]) <= MAX_BYTES
@@ -1,32 +1,94 @@
-from pysnmp.smi import builder, view
+from pysnmp.smi import builder
 import re
+import asyncio
+import itertools
 from datetime import datetime, timedelta
 from pysnmp.hlapi.v3arch.asyncio import *
 import time
 import os
-from enums import COMPILED_MIBS
+from enums import COMPILED_MIBS, PRUNED_MIBS, CDATA_EPON, CDATA_GPON, VSOL_GPON
 import cx_Oracle
+from db_pool import db_connection
+from onu_state import load_onu_state, save_onu_state, diff_onu_data, next_onu_state, summarize_diff
 from mib_compiler import setup_logging
+from mib_snapshot import load_snapshot, build_oid_table
+from oid_dict import oid_dictionary
+from oid_resolver import OidResolver, VarBindRecord
+from snmp_session import get_snmp_session
+from snmp_walker import walk_oid, walk_table, oid_to_tuple
 
 
 # Cache singleton
 _mib_cache = None
+_loaded_mibs = set()
+_oid_table_cache = None
+_oid_table_modules = set()
+_oid_resolver = None
 
 # Required MIBs mapping (add as needed)
 BRAND_MIB_MAP = ['IF-MIB', 'SNMPv2-MIB','NSCRTV-FTTX-EPON-MIB', 'NSCRTV-FTTX-GPON-MIB', 'V1600D', 'V1600G']
 
-# Function to load MIBs
-def load_mibs():
-    """Load and cache MIBs based on brand; fallback to all if unknown"""
+# OID subtrees defined by each MIB (shared vendor ancestors excluded)
+MIB_MODULE_ROOTS = {
+    'IF-MIB': ['1.3.6.1.2.1.2', '1.3.6.1.2.1.31'],
+    'SNMPv2-MIB': ['1.3.6.1.2.1.1', '1.3.6.1.2.1.11', '1.3.6.1.6.3.1'],
+    'NSCRTV-FTTX-EPON-MIB': ['1.3.6.1.4.1.17409.2.2.11', '1.3.6.1.4.1.17409.2.3', '1.3.6.1.4.1.17409.2.4',
+                             '1.3.6.1.4.1.17409.2.5', '1.3.6.1.4.1.17409.2.9'],
+    'NSCRTV-FTTX-GPON-MIB': ['1.3.6.1.4.1.17409.2.2.12', '1.3.6.1.4.1.17409.2.8'],
+    'V1600D': ['1.3.6.1.4.1.37950.1.1.5', '1.3.6.1.4.1.37950.2'],
+    'V1600G': ['1.3.6.1.4.1.37950.1.1.6'],
+}
+
+_MIB_MODULE_ROOT_TUPLES = {mib: [oid_to_tuple(root) for root in roots] for mib, roots in MIB_MODULE_ROOTS.items()}
+
+def _subtrees_intersect(oid_a, oid_b):
+    shorter = min(len(oid_a), len(oid_b))
+    return oid_a[:shorter] == oid_b[:shorter]
+
+def select_mib_modules(brand=None, oid_root=None):
+    """
+    Pick the MIB modules whose subtrees intersect the OIDs a poll will touch.
+
+    Args:
+        brand (str): Brand key of oid_dictionary (e.g. CDATA_EPON). None means any brand.
+        oid_root (str): Root OID of the walk, if any.
+
+    Returns:
+        list: Module names from BRAND_MIB_MAP; all of them if neither argument is given.
+    """
+    if brand is None and oid_root is None:
+        return list(BRAND_MIB_MAP)
+
+    oids = []
+    if brand is not None:
+        oids.extend(oid_to_tuple(brand_map[brand]) for brand_map in oid_dictionary.values() if brand in brand_map)
+    if oid_root:
+        oids.append(oid_to_tuple(oid_root))
+
+    return [
+        mib for mib in BRAND_MIB_MAP
+        if any(_subtrees_intersect(oid_to_tuple(root), oid) for root in MIB_MODULE_ROOTS.get(mib, []) for oid in oids)
+    ]
+
+def modules_for_oid(oid):
+    """Return the MIB modules whose subtree contains the given OID"""
+    oid = oid_to_tuple(oid)
+    return [
+        mib for mib, roots in _MIB_MODULE_ROOT_TUPLES.items()
+        if any(oid[:len(root)] == root for root in roots)
+    ]
+
+def _get_mib_builder():
     global _mib_cache
     if _mib_cache:
         return _mib_cache
 
-    print("Loading MIBs...")
-    start_time = time.time()
-
     mib_builder = builder.MibBuilder()
 
+    # Pruned modules (mib_compiler.py --prune) shadow the full compiled ones
+    if os.path.exists(PRUNED_MIBS):
+        mib_builder.add_mib_sources(builder.DirMibSource(PRUNED_MIBS))
+
     # Directories
     compiled_mib_dir = COMPILED_MIBS
     if os.path.exists(compiled_mib_dir):
@@ -39,23 +101,98 @@ def load_mibs():
     if os.path.exists(source_mib_dir):
         mib_builder.add_mib_sources(builder.DirMibSource(source_mib_dir))
 
-    # Choose MIBs to load
-    mibs_to_load = BRAND_MIB_MAP
+    _mib_cache = mib_builder
+    return mib_builder
 
+def _load_mib_modules(mibs_to_load):
+    mib_builder = _get_mib_builder()
     for mib in mibs_to_load:
+        if mib in _loaded_mibs:
+            continue
         t0 = time.time()
         try:
             mib_builder.load_modules(mib)
             print(f"Loaded {mib} in {time.time() - t0:.2f}s")
         except Exception as e:
             print(f"Warning: Could not load MIB {mib}: {e}")
+        _loaded_mibs.add(mib)
+    return mib_builder
 
-    _mib_cache = mib_builder
+# Function to load MIBs
+def load_mibs(brand=None, oid_root=None):
+    """Load and cache only the MIBs needed for brand/oid_root; all MIBs if neither is given"""
+    mibs_to_load = [mib for mib in select_mib_modules(brand, oid_root) if mib not in _loaded_mibs]
+    if not mibs_to_load:
+        return _get_mib_builder()
+
+    print(f"Loading MIBs: {', '.join(mibs_to_load)}")
+    start_time = time.time()
+
+    mib_builder = _load_mib_modules(mibs_to_load)
     print(mib_builder.mibSymbols.keys())
 
     print(f"MIB Load complete in {time.time() - start_time:.2f} seconds.")
     return mib_builder
 
+def load_mibs_for_oid(oid):
+    """Lazily load the MIB modules covering an OID; returns the newly loaded module names"""
+    mibs_to_load = [mib for mib in modules_for_oid(oid) if mib not in _loaded_mibs]
+    if mibs_to_load:
+        print(f"Lazily loading MIBs for {'.'.join(map(str, oid_to_tuple(oid)))}: {', '.join(mibs_to_load)}")
+        _load_mib_modules(mibs_to_load)
+    return mibs_to_load
+
+def _extend_oid_table(mibs):
+    mib_builder = _load_mib_modules(mibs)
+    new_entries = {oid: entry for oid, entry in build_oid_table(mib_builder).items() if oid not in _oid_table_cache}
+    _oid_table_cache.update(new_entries)
+    _oid_table_modules.update(mibs)
+    if _oid_resolver is not None:
+        _oid_resolver.update(new_entries)
+
+# Function to load the numeric OID -> (module, symbol, syntax) table
+def load_oid_table(brand=None, oid_root=None):
+    """Load the OID table from the MIB snapshot; fall back to brand-scoped MibBuilder if it is stale"""
+    global _oid_table_cache
+    if _oid_table_cache is None:
+        start_time = time.time()
+        oid_table = load_snapshot(BRAND_MIB_MAP)
+        if oid_table is not None:
+            print(f"Loaded {len(oid_table)} OIDs from MIB snapshot in {time.time() - start_time:.2f} seconds.")
+            _oid_table_modules.update(BRAND_MIB_MAP)
+        else:
+            # load_snapshot has already said why; MIBs are then loaded per brand below
+            oid_table = {}
+        _oid_table_cache = oid_table
+
+    missing_mibs = [mib for mib in select_mib_modules(brand, oid_root) if mib not in _oid_table_modules]
+    if missing_mibs:
+        load_mibs(brand, oid_root)
+        _extend_oid_table(missing_mibs)
+
+    return _oid_table_cache
+
+def _on_unresolved_oid(oid, entry):
+    """Resolver miss handler: pull in MIBs covering the OID that are not in the table yet"""
+    if len(_oid_table_modules) == len(MIB_MODULE_ROOTS):
+        return False
+    missing_mibs = [mib for mib in modules_for_oid(oid) if mib not in _oid_table_modules]
+    if not missing_mibs:
+        return False
+    load_mibs_for_oid(oid)
+    _extend_oid_table(missing_mibs)
+    return True
+
+def get_oid_resolver(brand=None, oid_root=None):
+    """Return the process-wide prefix-trie OID resolver, built once from the OID table"""
+    global _oid_resolver
+    oid_table = load_oid_table(brand, oid_root)
+    if _oid_resolver is None:
+        start_time = time.time()
+        _oid_resolver = OidResolver(oid_table, miss_handler=_on_unresolved_oid)
+        print(f"Built OID resolver with {_oid_resolver.size} nodes in {time.time() - start_time:.2f} seconds.")
+    return _oid_resolver
+
 def parse_onu_device_index(index: int):
     slot = (index >> 25) & 0x7F       # bits 25–31
     pon = (index >> 19) & 0x3F        # bits 19–24
@@ -100,75 +237,79 @@ def format_snmp_output_value(value, value_type):
     else:
         return f"{value_type}: {value.prettyPrint()}"
 
+# Render a VarBindRecord as a net-snmp style text line
+def render_varbind_record(record):
+    """Format a VarBindRecord as 'MODULE::obj.idx = TYPE: value'"""
+    if record.module is None:
+        symbolic_oid = record.symbol
+    else:
+        index_str = '.' + '.'.join([str(i) for i in record.index]) if record.index else ''
+        symbolic_oid = f"{record.module}::{record.symbol}{index_str}"
+    formatted_value = format_snmp_output_value(record.value, type(record.value).__name__.upper())
+    return f"{symbolic_oid} = {formatted_value}"
+
+# Stream an SNMP walk as resolved VarBindRecords
+async def walk_varbinds(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, brand=None, snmp_engine=None, bulk=False):
+    """
+    Async generator yielding a VarBindRecord per varbind of an SNMP walk.
+
+    The walk runs on the process-wide engine and pooled transport from
+    snmp_session.get_snmp_session; snmp_engine overrides the engine. bulk=True
+    uses GETBULK on SNMPv2c targets (see walk_session_varbinds).
+
+    Raises:
+        RuntimeError: on an error indication or error status from the agent.
+    """
+    # Shared OID resolver (snapshot, or only this brand's MIBs if the snapshot is stale)
+    oid_resolver = get_oid_resolver(brand, oid)
+    session = await get_snmp_session(ip, port, community, snmp_version, snmp_timeout, snmp_retries)
+    if snmp_engine is not None:
+        session = (snmp_engine,) + tuple(session[1:])
+    async for record in walk_session_varbinds(session, oid, oid_resolver, bulk):
+        yield record
+
+# Stream a walk over an existing (engine, community, transport, context) session
+async def walk_session_varbinds(session, oid, oid_resolver, bulk=False, sizer=None):
+    """
+    Async generator yielding a VarBindRecord per varbind of a walk over session,
+    e.g. one returned by snmp_session.get_snmp_session.
+
+    With bulk=True SNMPv2c targets are walked with GETBULK and an adaptive
+    max-repetitions (sizer); SNMPv1 targets always use GETNEXT.
+
+    Raises:
+        RuntimeError: on an error indication or error status from the agent.
+    """
+    async for oid_val, value in walk_oid(session, oid, bulk, sizer):
+        yield oid_resolver.resolve_record(oid_val, value)
+
 # Perform SNMP Walk using async walk_cmd
-async def snmp_walk(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, debug_mode):
+async def snmp_walk(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, brand=None, as_records=False, bulk=False):
+    """Walk oid and return VarBindRecords (as_records=True) or net-snmp style text lines"""
     setup_logging(debug_mode)
     result = []
     # Start timing
     start_time = time.time()
-    
-    # Load all MIBs
-    mib_builder = load_mibs()
-    mib_view = view.MibViewController(mib_builder)
-    
-    # Create the generator for the SNMP walk operation
-    objects = walk_cmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=snmp_version),
-        await UdpTransportTarget.create((ip, port), timeout=snmp_timeout, retries=snmp_retries),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid)),
-        lexicographicMode=False
-    )
-    
-    
-    # Process the response from the SNMP walk
-    async for errorIndication, errorStatus, errorIndex, varBinds in objects:
-        if errorIndication:
-            print(f"Error: {errorIndication}")
-            return [f"Error: {errorIndication}"]
-        elif errorStatus:
-            print(f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}")
-            return [f"SNMP Error: {errorStatus.prettyPrint()} at {errorIndex and varBinds[int(errorIndex) - 1][0] or '?'}"]
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                
-                # Try to resolve to symbolic name
-                try:
-                    oid_obj = ObjectIdentity(oid)
-                    oid_obj.resolve_with_mib(mib_view)
-                    symbolic_oid = oid_obj.prettyPrint()
-                except Exception as e:
-                    # On failure, use the numeric OID but try to resolve as much as possible
-                    try:
-                        # Try to resolve the module and object name
-                        mib_node = mib_view.get_node_name(oid)
-                        module_name = mib_node[0]
-                        obj_name = mib_node[1]
-                        
-                        # Get any indices
-                        indices = list(oid[len(mib_view.get_node_oid(mib_node)):])
-                        index_str = '.' + '.'.join([str(i) for i in indices]) if indices else ''
-                        
-                        symbolic_oid = f"{module_name}::{obj_name}{index_str}"
-                    except Exception:
-                        symbolic_oid = oid.prettyPrint()
-                
-                # Format the value based on its type
-                value_type = type(value).__name__.upper()
-                formatted_value = format_snmp_output_value(value, value_type)
-                
-                print(f"{symbolic_oid} = {formatted_value}")
-                
-                # Append formatted output
-                result.append(f"{symbolic_oid} = {formatted_value}")
+
+    try:
+        async for record in walk_varbinds(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, brand, bulk=bulk):
+            if as_records:
+                result.append(record)
+            else:
+                line = render_varbind_record(record)
+                print(line)
+                result.append(line)
+    except RuntimeError as e:
+        print(e)
+        return [] if as_records else [str(e)]
 
     # End timing
     end_time = time.time()
     elapsed_time = end_time - start_time
+    oid_resolver = get_oid_resolver(brand, oid)
     print(f"Elapsed time: {elapsed_time:.2f} seconds")
     print(f"SNMP walk completed. Found {len(result)} OIDs.")
+    print(f"OID resolver column cache: {oid_resolver.cache_hits} hits, {oid_resolver.cache_misses} misses.")
     return result
 
 # Function to convert hex MAC to formatted string
@@ -184,359 +325,736 @@ def convert_power_to_dbm(power_value):
     # The value -2268 suggests units of 0.01 dBm, hence division by 100.
     return float(power_value) / 100.0  # Divide by 100 for dBm value
 
-# Function to parse SNMP output and extract CDATA ONU data
-def parse_cdata_onu_data(data_str): # Renamed argument to avoid conflict with internal 'data' variables
-    onu_data = {} # This dictionary will use string keys for ONU indices
-
-    # Helper to initialize ONU entry if it doesn't exist and set IFINDEX
-    def ensure_onu_entry(index_key_str):
-        if index_key_str not in onu_data:
-            onu_data[index_key_str] = {}
-            # Populate IFINDEX using the string key, converted to an integer
-            onu_data[index_key_str]['IFINDEX'] = int(index_key_str)
-
-    # MAC Address
-    mac_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuMacAddress\.(\d+) = Hex-STRING: ([0-9A-F ]+)', data_str)
-    for index_s, mac in mac_matches:
-        ensure_onu_entry(index_s)
-        onu_data[index_s]['MAC'] = format_mac(mac)
-        
-    # Serial Number
-    sn_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuSn\.(\d+) = Hex-STRING: ([0-9A-F ]+)', data_str)
-    for index_s, sn in sn_matches:
-        ensure_onu_entry(index_s)
-        onu_data[index_s]['SLNO'] = format_mac(sn)
-    
-    # Operation Status - Made INTEGER32 optional in regex
-    status_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuOperationStatus\.(\d+) = INTEGER(?:32)?: (\d+)', data_str)
-    for index_s, status_val in status_matches:
-        ensure_onu_entry(index_s)
-        onu_data[index_s]['STATUS'] = int(status_val)
-    
-    # Admin Status - Made INTEGER32 optional in regex
-    admin_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuAdminStatus\.(\d+) = INTEGER(?:32)?: (\d+)', data_str)
-    for index_s, status_val in admin_matches:
-        ensure_onu_entry(index_s)
-        # Assuming '2' means disabled, and you want to map it to status '3'
-        if str(status_val) == '2': 
-            onu_data[index_s]['STATUS'] = 3 
-    
-    # Distance - Made INTEGER32 optional in regex
-    distance_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuTestDistance\.(\d+) = INTEGER(?:32)?: (\d+)', data_str)
-    for index_s, distance in distance_matches:
-        ensure_onu_entry(index_s)
-        onu_data[index_s]['DISTANCE'] = int(distance)
-    
-    # Time Since Last Register (for UP_SINCE calculation)
-    # Sample output shows "Counter32: 5954", assuming value is in seconds.
-    time_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuTimeSinceLastRegister\.(\d+) = Counter32: (\d+)', data_str)
-    for index_s, seconds_str in time_matches:
-        ensure_onu_entry(index_s)
-        current_time = datetime.now()
-        up_since = current_time - timedelta(seconds=int(seconds_str))
-        onu_data[index_s]['UP_SINCE'] = up_since
-    
-    # Vendor ID
-    vendor_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuVendorId\.(\d+) = Hex-STRING: ([0-9A-F ]+)', data_str)
-    for index_s, vendor_hex in vendor_matches:
-        ensure_onu_entry(index_s)
-        # Convert hex to ASCII, filtering only printable characters
-        vendor = ''.join([chr(int(h, 16)) for h in vendor_hex.split() if 32 <= int(h, 16) <= 126])
-        onu_data[index_s]['ONU_VENDOR'] = vendor.strip()
-    
-    # Model ID - Made regex for string non-greedy and improved hex decoding
-    model_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuModelId\.(\d+) = (?:STRING: "([^"]*)"|Hex-STRING: ([0-9A-F ]+))', data_str)
-    for match in model_matches:
-        index_s = match[0]
-        ensure_onu_entry(index_s)
-        
-        model_str_val = match[1]  # Captured group for STRING
-        model_hex_val = match[2]  # Captured group for Hex-STRING
-        model = ""
-
-        if model_str_val is not None: # Check if STRING part matched
-            model = model_str_val.split('(')[0].strip() # Remove hex part if present, e.g. "ModelName (0123ABCD)"
-        elif model_hex_val is not None: # Check if Hex-STRING part matched
-            try:
-                # Remove spaces before converting hex to bytes
-                byte_data = bytes.fromhex(model_hex_val.replace(" ", ""))
-                model = byte_data.decode('utf-8', errors='ignore').strip()
-            except ValueError: 
-                model = "" # Or log an error
-        onu_data[index_s]['ONU_MODEL'] = model
-    
-    # Received Optical Power - Made INTEGER32 optional in regex
-    power_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuReceivedOpticalPower\.(\d+)\.(\d+)\.(\d+) = INTEGER(?:32)?: (-?\d+)', data_str)
-    for index_s, port1, port2, power_val_str in power_matches: # index_s is the string ONU index
-        ensure_onu_entry(index_s) # Use the string index as the key
-        
-        # For onu_num calculation, int(index_s) is fine
-        onu_num_val = int(index_s) & 0xFF 
-        onu_data[index_s]['POWER'] = convert_power_to_dbm(power_val_str)
-        onu_data[index_s]['IFINDEX2'] = f'epon0/{port1}/{port2}/{onu_num_val}'
-    
-    return onu_data
+# net-snmp style text line: "MODULE::column.index = TYPE: value"
+SNMP_LINE_PATTERN = re.compile(r'^(?:[A-Za-z0-9\-]+::)?(\w+)\.(\d+(?:\.\d+)*) = (.*)$')
 
-# Function to parse SNMP output and extract VSOL ONU data
-def parse_vsol_onu_data(data_str): # Renamed argument to avoid conflict with internal 'data' variables
-    onu_data = {} # This dictionary will use string keys for ONU indices
-
-    # Helper to initialize ONU entry if it doesn't exist and set IFINDEX
-    def ensure_onu_entry(index_key_str):
-        if index_key_str not in onu_data:
-            onu_data[index_key_str] = {}
-            # Populate IFINDEX using the string key, converted to an integer
-            onu_data[index_key_str]['IFINDEX'] = index_key_str
-
-    # MAC Address
-    mac_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?onuMacAddress\.(\d+) = Hex-STRING: ([0-9A-F ]+)', data_str)
-    for name, portandonu, mac in mac_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['MAC'] = format_mac(mac)
-        
-    # Serial Number
-    sn_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuDetailInfoSn)\.((?:\d+\.)*\d+) = (?:STRING|Hex-STRING): "?([^"]+)"?', data_str)
-    for name, portandonu, sn in sn_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['SLNO'] = sn
-    
-    # Operation Status - Made INTEGER32 optional in regex
-    status_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuDetailInfoOpSta)\.((?:\d+\.)*\d+) = (?:INTEGER): (\d)', data_str)
-    for name, portandonu, status_val in status_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['STATUS'] = int(status_val)
-    
-    # Admin Status - Made INTEGER32 optional in regex
-    admin_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuStaInfoAdminSta)\.((?:\d+\.)*\d+) = (?:INTEGER): (\d)', data_str)
-    for name, portandonu, status_val in admin_matches:
-        ensure_onu_entry(portandonu)
-        # Assuming '2' means disabled, and you want to map it to status '3'
-        if str(status_val) == '2': 
-            onu_data[portandonu]['STATUS'] = 3 
-    
-    # Distance - Made INTEGER32 optional in regex
-    distance_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(DISTANCE)\.((?:\d+\.)*\d+) = (?:INTEGER): "?([^"]+)"?', data_str)
-    for name, portandonu, distance in distance_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['DISTANCE'] = int(distance)
-    
-    # Time Since Last Register (for UP_SINCE calculation)
-    # Sample output shows "Counter32: 5954", assuming value is in seconds.
-    time_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuDetailInfoSysUpTime)\.((?:\d+\.)*\d+) = STRING: "(N\/A|\d+ s)"', data_str)
-    for name, portandonu, uptime in time_matches:
-        ensure_onu_entry(portandonu)
-        current_time = datetime.now()
+# Decode an OCTET STRING the way format_snmp_output_value renders it
+def octets_to_text(raw):
+    """Return the printable text of raw bytes, or their spaced upper-case hex if they are binary"""
+    if raw and all(32 <= byte <= 126 for byte in raw):
+        return raw.decode('ascii')
+    return " ".join([f"{byte:02X}" for byte in raw])
+
+def _record_value(value):
+    """Plain Python value of a pyasn1 varbind value: bytes for OCTET STRINGs, int otherwise"""
+    if hasattr(value, 'asOctets'):
+        return bytes(value.asOctets())
+    return int(value)
+
+def _text_value(value_str):
+    """Plain Python value of the value part of a net-snmp style text line"""
+    if value_str.startswith('Hex-STRING: '):
+        return bytes.fromhex(value_str[12:])
+    if value_str.startswith('STRING: '):
+        return value_str[8:].strip('"').encode()
+    if value_str == '""':
+        return b''
+    value_type, _, raw = value_str.partition(': ')
+    if value_type.upper() == 'TIMETICKS':
+        return int(raw[1:raw.index(')')])
+    return int(raw)
+
+def _iter_snmp_lines(lines):
+    """Yield (column, index_tuple, value_str) for every well-formed text line"""
+    match_line = SNMP_LINE_PATTERN.match
+    for line in lines:
+        match = match_line(line.rstrip('\r\n'))
+        if match:
+            column, index_str, value_str = match.groups()
+            yield column, tuple(map(int, index_str.split('.'))), value_str
+
+def _as_lines(data):
+    return data.splitlines() if isinstance(data, str) else data
+
+def _cdata_mac(entry, index, value):
+    entry['MAC'] = format_mac(value.hex().upper())
+
+def _cdata_sn(entry, index, value):
+    entry['SLNO'] = format_mac(value.hex().upper())
+
+def _set_status(entry, index, value):
+    entry['STATUS'] = value
+
+def _set_admin_status(entry, index, value):
+    # '2' means disabled; applied after all columns so it overrides the operation status
+    if value == 2:
+        entry['_ADMIN_DISABLED'] = True
+
+def _cdata_distance(entry, index, value):
+    entry['DISTANCE'] = value
+
+def _cdata_time_since_register(entry, index, value):
+    entry['UP_SINCE'] = datetime.now() - timedelta(seconds=value)
+
+def _cdata_vendor(entry, index, value):
+    entry['ONU_VENDOR'] = ''.join([chr(byte) for byte in value if 32 <= byte <= 126]).strip()
+
+def _cdata_model(entry, index, value):
+    if value and all(32 <= byte <= 126 for byte in value):
+        entry['ONU_MODEL'] = value.decode('ascii').split('(')[0].strip()
+    else:
+        entry['ONU_MODEL'] = value.decode('utf-8', errors='ignore').strip()
+
+def _cdata_power(entry, index, value):
+    entry['POWER'] = convert_power_to_dbm(value)
+    if len(index) >= 3:
+        entry['IFINDEX2'] = f'epon0/{index[1]}/{index[2]}/{index[0] & 0xFF}'
+
+# Per-column handlers for CDATA: column symbol -> handler(entry, index_tuple, plain_value)
+CDATA_COLUMN_HANDLERS = {
+    'onuMacAddress': _cdata_mac,
+    'onuSn': _cdata_sn,
+    'onuOperationStatus': _set_status,
+    'onuAdminStatus': _set_admin_status,
+    'onuTestDistance': _cdata_distance,
+    'onuTimeSinceLastRegister': _cdata_time_since_register,
+    'onuVendorId': _cdata_vendor,
+    'onuModelId': _cdata_model,
+    'onuReceivedOpticalPower': _cdata_power,
+}
+
+def _vsol_sn(entry, index, value):
+    entry['SLNO'] = octets_to_text(value)
+
+def _vsol_uptime(entry, index, value):
+    uptime = octets_to_text(value)
     if uptime == "N/A":
-        up_since = None
+        entry['UP_SINCE'] = None
     else:
-        seconds = int(uptime.split(' ')[0])  # safely extract the number before ' s'
-        up_since = current_time - timedelta(seconds=seconds)
-    onu_data[portandonu]['UP_SINCE'] = up_since
-    
-    # Vendor ID
-    vendor_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuDetailInfoVendorId)\.((?:\d+\.)*\d+) = (?:STRING): "?([^"]+)"?', data_str)
-    for name, portandonu, vendor in vendor_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['ONU_VENDOR'] = vendor.strip()
-    
-    # Model ID - Made regex for string non-greedy and improved hex decoding
-    model_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuModel)\.((?:\d+\.)*\d+) = (?:STRING): "?([^"]+)"?', data_str)
-    for name, portandonu, model in model_matches:
-        ensure_onu_entry(portandonu)
-        onu_data[portandonu]['ONU_MODEL'] = model
-    
-    # Received Optical Power - Made INTEGER32 optional in regex
-    power_matches = re.findall(r'(?:[A-Za-z0-9\-]+::)?(gOnuOpticalInfoRxPwr)\.((?:\d+\.)*\d+) = (?:STRING): "?([^"]+)"?', data_str)
-    for name, portandonu, power_val_str in power_matches: # portandonu is the string ONU index
-        ensure_onu_entry(portandonu) # Use the string index as the key
-        
-        # For onu_num calculation, int(portandonu) is fine
-        onu_num_val = int(portandonu) & 0xFF 
-        onu_data[portandonu]['POWER'] = convert_power_to_dbm(power_val_str)
-        onu_data[portandonu]['IFINDEX2'] = f'{portandonu}/{onu_num_val}'
-    
+        entry['UP_SINCE'] = datetime.now() - timedelta(seconds=int(uptime.split(' ')[0]))
+
+def _vsol_vendor(entry, index, value):
+    entry['ONU_VENDOR'] = octets_to_text(value).strip()
+
+def _vsol_model(entry, index, value):
+    entry['ONU_MODEL'] = octets_to_text(value)
+
+def _vsol_power(entry, index, value):
+    # VSOL reports the received power as a dBm string, e.g. "-14.43"
+    entry['POWER'] = float(octets_to_text(value))
+    entry['IFINDEX2'] = '/'.join([str(i) for i in index])
+
+# Per-column handlers for VSOL: column symbol -> handler(entry, index_tuple, plain_value)
+VSOL_COLUMN_HANDLERS = {
+    'gOnuDetailInfoSn': _vsol_sn,
+    'gOnuDetailInfoOpSta': _set_status,
+    'gOnuStaInfoAdminSta': _set_admin_status,
+    'gOnuDetailInfoSysUpTime': _vsol_uptime,
+    'gOnuDetailInfoVendorId': _vsol_vendor,
+    'gOnuModel': _vsol_model,
+    'gOnuOpticalInfoRxPwr': _vsol_power,
+}
+
+def _cdata_onu_key(index):
+    # CDATA ONUs are keyed by the onuDeviceIndex (first index component)
+    return str(index[0]), index[0]
+
+def _vsol_onu_key(index):
+    # VSOL ONUs are keyed by '<pon>.<onu>'
+    index_s = '.'.join([str(i) for i in index])
+    return index_s, index_s
+
+def _apply_varbind(onu_data, column, index, value, handlers, convert, onu_key):
+    """
+    Dispatch one varbind to its column handler.
+
+    The ONU entry is only added to onu_data once a handler has succeeded, so a
+    value that fails to parse never leaves an entry holding nothing but IFINDEX.
+    """
+    handler = handlers.get(column)
+    if handler is None or not index:
+        return
+    index_s, ifindex = onu_key(index)
+    entry = onu_data.get(index_s)
+    is_new = entry is None
+    if is_new:
+        entry = {'IFINDEX': ifindex}
+    try:
+        handler(entry, index, convert(value))
+    except (ValueError, TypeError) as e:
+        print(f"Warning: Could not parse {column}.{index_s}: {e}")
+        return
+    if is_new:
+        onu_data[index_s] = entry
+
+def _collect_onu_data(varbinds, handlers, convert, onu_key):
+    """
+    Fill per-ONU dicts in a single pass over (column, index_tuple, value) triples.
+
+    Args:
+        varbinds (iterable): (column symbol, index tuple, raw value) triples.
+        handlers (dict): column symbol -> handler(entry, index, plain_value).
+        convert (callable): Turns a raw value into the plain value handlers expect.
+        onu_key (callable): index tuple -> (onu_data key, IFINDEX value).
+
+    Returns:
+        dict: {onu_key: {field: value}}.
+    """
+    onu_data = {}
+    for column, index, value in varbinds:
+        _apply_varbind(onu_data, column, index, value, handlers, convert, onu_key)
+    return _finalize_onu_data(onu_data)
+
+def _finalize_onu_data(onu_data):
+    for entry in onu_data.values():
+        if entry.pop('_ADMIN_DISABLED', False):
+            entry['STATUS'] = 3
     return onu_data
 
-# Function to insert data into Oracle database
-def insert_into_db(onu_data, ip, db_host, db_port, db_user, db_pass, db_sid):
-    # Create DSN
-    dsn_tns = cx_Oracle.makedsn(db_host, db_port, sid=db_sid)
-    
+# Function to parse SNMP output and extract CDATA ONU data
+def parse_cdata_onu_data(data):
+    """
+    Parse CDATA ONU data from net-snmp style text in a single pass.
+
+    Args:
+        data (str | iterable): The joined SNMP output, or any iterator of its
+                               lines (e.g. an open file), so the full text
+                               never has to be materialized.
+
+    Returns:
+        dict: {onuDeviceIndex string: {field: value}}.
+    """
+    return _collect_onu_data(_iter_snmp_lines(_as_lines(data)), CDATA_COLUMN_HANDLERS, _text_value, _cdata_onu_key)
+
+# Function to parse SNMP output and extract VSOL ONU data
+def parse_vsol_onu_data(data):
+    """
+    Parse VSOL ONU data from net-snmp style text in a single pass.
+
+    Args:
+        data (str | iterable): The joined SNMP output, or any iterator of its lines.
+
+    Returns:
+        dict: {'<pon>.<onu>': {field: value}}.
+    """
+    return _collect_onu_data(_iter_snmp_lines(_as_lines(data)), VSOL_COLUMN_HANDLERS, _text_value, _vsol_onu_key)
+
+# Function to build CDATA ONU data from VarBindRecords
+def parse_cdata_onu_records(records):
+    """Same output as parse_cdata_onu_data, built from VarBindRecords instead of text"""
+    varbinds = ((record.symbol, record.index, record.value) for record in records)
+    return _collect_onu_data(varbinds, CDATA_COLUMN_HANDLERS, _record_value, _cdata_onu_key)
+
+# Function to build VSOL ONU data from VarBindRecords
+def parse_vsol_onu_records(records):
+    """VSOL ONU data keyed by '<pon>.<onu>', built from VarBindRecords instead of text"""
+    varbinds = ((record.symbol, record.index, record.value) for record in records)
+    return _collect_onu_data(varbinds, VSOL_COLUMN_HANDLERS, _record_value, _vsol_onu_key)
+
+# Brand -> (column handlers, ONU key function) used to parse a walk as it streams in
+BRAND_ONU_PARSERS = {
+    CDATA_EPON: (CDATA_COLUMN_HANDLERS, _cdata_onu_key),
+    CDATA_GPON: (CDATA_COLUMN_HANDLERS, _cdata_onu_key),
+    VSOL_GPON: (VSOL_COLUMN_HANDLERS, _vsol_onu_key),
+}
+
+# Handled columns that live in a table with a different index than the brand's ONU table:
+# the CDATA optical power table is indexed by (device, card, port), not onuDeviceIndex
+BRAND_SIDE_TABLE_COLUMNS = {
+    CDATA_EPON: {'onuReceivedOpticalPower'},
+    CDATA_GPON: {'onuReceivedOpticalPower'},
+}
+
+# Walk an OLT and parse its ONU data while the walk is still running
+async def walk_onu_data(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, brand, on_record=None, snmp_engine=None, bulk=False):
+    """
+    Walk oid and build the brand's ONU data from each varbind as it arrives.
+
+    Args:
+        brand (str): One of BRAND_ONU_PARSERS, e.g. CDATA-EPON or VSOL-GPON.
+        on_record (callable): Optional hook called with every VarBindRecord,
+                              e.g. to stream the raw walk to a file.
+        snmp_engine (SnmpEngine): Optional engine shared across walks.
+        bulk (bool): Use GETBULK with adaptive max-repetitions on SNMPv2c targets.
+
+    Returns:
+        dict: The same ONU data as parse_*_onu_records on the full walk, or None
+              if the walk failed (an empty dict means the OLT reported no ONUs).
+    """
+    if brand not in BRAND_ONU_PARSERS:
+        raise ValueError(f"Unsupported brand: {brand}")
+    handlers, onu_key = BRAND_ONU_PARSERS[brand]
+    setup_logging(debug_mode)
+    onu_data = {}
+    count = 0
+    start_time = time.time()
+
     try:
-        # Establish connection
-        connection = cx_Oracle.connect(db_user, db_pass, dsn_tns)
-        cursor = connection.cursor()
-        
-        print(f"Connected to Oracle Database.")
-        
-        # Get the switch ID from the SWITCHES table based on IP address
+        async for record in walk_varbinds(ip, community, oid, port, snmp_version, snmp_timeout, snmp_retries, brand, snmp_engine, bulk):
+            count += 1
+            if on_record is not None:
+                on_record(record)
+            _apply_varbind(onu_data, record.symbol, record.index, record.value, handlers, _record_value, onu_key)
+    except RuntimeError as e:
+        print(e)
+        return None
+
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
+    print(f"SNMP walk completed. Found {count} OIDs, {len(onu_data)} ONUs.")
+    return _finalize_onu_data(onu_data)
+
+# oid_dictionary columns of a brand that one of its column handlers parses
+def brand_column_oids(brand, oid_resolver):
+    """
+    Resolve the brand's oid_dictionary columns and keep only those with a handler.
+
+    oid_dictionary also lists columns nothing parses for some brands (the VSOL
+    MAC-address table, the CDATA GPON serial/vendor/model columns), and walking
+    those would only download data that is thrown away.
+
+    Returns:
+        dict: {column OID: (module, symbol)} in oid_dictionary order.
+    """
+    handlers, _ = BRAND_ONU_PARSERS[brand]
+    columns = {}
+    for brand_map in oid_dictionary.values():
+        if brand not in brand_map:
+            continue
+        entry, _ = oid_resolver.lookup(oid_to_tuple(brand_map[brand]))
+        if entry is not None and entry[1] in handlers:
+            columns[brand_map[brand]] = (entry[0], entry[1])
+    return columns
+
+# Walk only the brand's columns, concurrently, and merge them into ONU data by index
+async def walk_onu_columns(ip, community, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, brand, on_record=None, bulk=False):
+    """
+    Build the brand's ONU data from one walk per handled oid_dictionary column
+    instead of one sequential walk of the whole OID_TO_WALK subtree.
+
+    The column walks run concurrently over the shared session from
+    snmp_session.get_snmp_session, so columns that are never parsed are not
+    fetched and the round trips of the columns overlap. Each varbind goes
+    straight to the column handlers; entries merge by ONU index.
+
+    Returns:
+        dict: Same shape as walk_onu_data, or None if any column walk failed.
+    """
+    if brand not in BRAND_ONU_PARSERS:
+        raise ValueError(f"Unsupported brand: {brand}")
+    handlers, onu_key = BRAND_ONU_PARSERS[brand]
+    setup_logging(debug_mode)
+    oid_resolver = get_oid_resolver(brand)
+    columns = list(brand_column_oids(brand, oid_resolver))
+    session = await get_snmp_session(ip, port, community, snmp_version, snmp_timeout, snmp_retries)
+    onu_data = {}
+    counts = {}
+    start_time = time.time()
+
+    async def walk_column(column_oid):
+        counts[column_oid] = 0
+        async for record in walk_session_varbinds(session, column_oid, oid_resolver, bulk):
+            counts[column_oid] += 1
+            if on_record is not None:
+                on_record(record)
+            _apply_varbind(onu_data, record.symbol, record.index, record.value, handlers, _record_value, onu_key)
+
+    results = await asyncio.gather(*[walk_column(column_oid) for column_oid in columns], return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if not isinstance(error, RuntimeError):
+            raise error
+    if errors:
+        for error in errors:
+            print(error)
+        return None
+
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
+    print(f"Column walks completed. Found {sum(counts.values())} OIDs in {len(columns)} columns, {len(onu_data)} ONUs.")
+    return _finalize_onu_data(onu_data)
+
+# Walk the brand's ONU-table columns in lock-step and feed each complete ONU row to the parsers
+async def walk_onu_table(ip, community, port, snmp_version, snmp_timeout, snmp_retries, debug_mode, brand, on_record=None, bulk=False):
+    """
+    Build the brand's ONU data with snmp_walker.walk_table: every request
+    carries all handled columns that share the ONU index, so one round trip
+    returns a complete ONU row instead of one cell.
+
+    Handled columns from a table with another index (BRAND_SIDE_TABLE_COLUMNS)
+    are not rows of the ONU table, so each is walked on its own while the
+    table walk runs.
+
+    Returns:
+        dict: Same shape as walk_onu_data, or None if the walk failed.
+    """
+    if brand not in BRAND_ONU_PARSERS:
+        raise ValueError(f"Unsupported brand: {brand}")
+    handlers, onu_key = BRAND_ONU_PARSERS[brand]
+    setup_logging(debug_mode)
+    oid_resolver = get_oid_resolver(brand)
+    # Column OID -> (module, symbol), so row cells dispatch to the same handlers as walked varbinds
+    column_entries = brand_column_oids(brand, oid_resolver)
+    side_symbols = BRAND_SIDE_TABLE_COLUMNS.get(brand, set())
+    row_columns = [column for column, (_, symbol) in column_entries.items() if symbol not in side_symbols]
+    side_columns = [column for column, (_, symbol) in column_entries.items() if symbol in side_symbols]
+    session = await get_snmp_session(ip, port, community, snmp_version, snmp_timeout, snmp_retries)
+    onu_data = {}
+    counts = {'rows': 0, 'side': 0}
+    start_time = time.time()
+
+    async def walk_rows():
+        async for index, row in walk_table(session, row_columns, bulk):
+            counts['rows'] += 1
+            for column, value in row.items():
+                module_name, symbol = column_entries[column]
+                if on_record is not None:
+                    on_record(VarBindRecord(oid_to_tuple(column) + index, module_name, symbol, index, value))
+                _apply_varbind(onu_data, symbol, index, value, handlers, _record_value, onu_key)
+
+    async def walk_side_column(column_oid):
+        async for record in walk_session_varbinds(session, column_oid, oid_resolver, bulk):
+            counts['side'] += 1
+            if on_record is not None:
+                on_record(record)
+            _apply_varbind(onu_data, record.symbol, record.index, record.value, handlers, _record_value, onu_key)
+
+    results = await asyncio.gather(walk_rows(), *[walk_side_column(column) for column in side_columns],
+                                   return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if not isinstance(error, RuntimeError):
+            raise error
+    if errors:
+        for error in errors:
+            print(error)
+        return None
+
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
+    print(f"Table walk completed. Found {counts['rows']} rows over {len(row_columns)} columns"
+          f" and {counts['side']} OIDs in {len(side_columns)} side-table columns, {len(onu_data)} ONUs.")
+    return _finalize_onu_data(onu_data)
+
+# Columns of SWITCH_SNMP_ONU_PORTS filled from the parsed ONU data
+ONU_PORT_FIELDS = ['MAC', 'POWER', 'STATUS', 'IFDESCR', 'PORTNO', 'IFINDEX', 'ONU_PORT', 'PON_PORT',
+                   'PARENT_ID', 'SLNO', 'DISTANCE', 'UP_SINCE', 'ONU_MODEL', 'ONU_VENDOR', 'IFINDEX2']
+
+# ID comes from the sequence inside the INSERT, so a batch is a single round trip
+INSERT_ONU_PORT_SQL = """
+INSERT INTO SWITCH_SNMP_ONU_PORTS
+(ID, PORT_ID, MAC, POWER, STATUS, IFDESCR, PORTNO, SW_ID, IFINDEX,
+UDATE, ONU_PORT, PON_PORT, PARENT_ID, SLNO, DISTANCE, UP_SINCE, ONU_MODEL, ONU_VENDOR, IFINDEX2)
+VALUES
+(SWITCH_SNMP_ONU_PORTS_sq.nextval, NULL, :mac, :power, :status, :ifdescr, :portno, :sw_id, :ifindex,
+:udate, :onu_port, :pon_port, :parent_id, :slno, :distance, :up_since, :onu_model, :onu_vendor, :ifindex2)
+"""
+
+def get_db_batch_size(batch_size=None):
+    """Rows per executemany/commit: the argument, else DB_BATCH_SIZE from the environment, else 1000"""
+    return int(batch_size or os.getenv("DB_BATCH_SIZE", 1000))
+
+# SWITCHES IP -> ID, bulk loaded once and shared by every insert path in the process
+_switch_ids = {}
+_switch_ids_loaded_at = None
+
+# Minimum seconds between reloads triggered by an IP that is not in the cache
+SWITCH_ID_MISS_REFRESH = 60
+
+def load_switch_ids(cursor):
+    """Replace the switch-ID cache with the full SWITCHES table (one query)"""
+    global _switch_ids, _switch_ids_loaded_at
+    cursor.execute("SELECT IP, ID FROM SWITCHES WHERE IP IS NOT NULL")
+    _switch_ids = {ip: sw_id for ip, sw_id in cursor.fetchall()}
+    _switch_ids_loaded_at = time.time()
+    print(f"Loaded {len(_switch_ids)} switch IDs from SWITCHES table.")
+    return _switch_ids
+
+# Function to look up the SWITCHES.ID of an OLT by its IP address
+def get_switch_id(cursor, ip):
+    """
+    Resolve an OLT IP to SWITCHES.ID from the process-wide cache.
+
+    The cache is bulk loaded on first use and reloaded once it is older than
+    SWITCH_CACHE_TTL seconds (default 3600), or on a miss when the last load is
+    more than SWITCH_ID_MISS_REFRESH seconds old, so newly added switches are
+    picked up without a query per unknown IP.
+
+    Returns:
+        The switch ID, or None if the IP is not in SWITCHES.
+    """
+    ttl = int(os.getenv("SWITCH_CACHE_TTL", 3600))
+    age = time.time() - _switch_ids_loaded_at if _switch_ids_loaded_at is not None else None
+    if age is None or age > ttl or (ip not in _switch_ids and age > SWITCH_ID_MISS_REFRESH):
         try:
-            cursor.execute("SELECT ID FROM SWITCHES WHERE IP = :ip", {"ip": ip})
-            result = cursor.fetchone()
-            sw_id = result[0] if result else None
+            load_switch_ids(cursor)
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            print(f"Error retrieving switch IDs from SWITCHES table: {error.message}")
+    return _switch_ids.get(ip)
+
+def resolve_switch_id(ip, db_host, db_port, db_user, db_pass, db_sid):
+    """Resolve SW_ID with a pooled connection, e.g. before an OLT's walk starts"""
+    with db_connection(db_host, db_port, db_user, db_pass, db_sid) as connection:
+        return get_switch_id(connection.cursor(), ip)
+
+def _onu_port_row(data, sw_id, current_time):
+    row = {field.lower(): data.get(field) for field in ONU_PORT_FIELDS}
+    row['sw_id'] = sw_id
+    row['udate'] = current_time
+    return row
+
+def execute_batches(connection, cursor, sql, rows, batch_size):
+    """
+    Array-bind rows into sql with executemany, committing once per batch.
+
+    Args:
+        connection: Open cx_Oracle connection.
+        cursor: Cursor of that connection, with any input sizes already set.
+        sql (str): Statement with named binds matching the row dicts.
+        rows (iterable): Bind dicts; consumed lazily, one batch at a time.
+        batch_size (int): Rows per executemany call and commit.
+
+    Returns:
+        tuple: (rows bound, rows affected as reported by cursor.rowcount).
+    """
+    total = 0
+    affected = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            connection.commit()
+            total += len(batch)
+            affected += cursor.rowcount
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        connection.commit()
+        total += len(batch)
+        affected += cursor.rowcount
+    return total, affected
+
+# Columns MERGE compares exactly; DECODE treats two NULLs as equal
+MERGE_COMPARED_COLUMNS = ['MAC', 'POWER', 'STATUS', 'IFDESCR', 'PORTNO', 'ONU_PORT', 'PON_PORT', 'PARENT_ID',
+                          'SLNO', 'DISTANCE', 'ONU_MODEL', 'ONU_VENDOR', 'IFINDEX2']
+
+def _merge_column_changed(column):
+    if column == 'UP_SINCE':
+        # UP_SINCE is derived from now() - uptime, so it jitters between polls; only a move of
+        # more than a minute (a re-registration) counts as a change. The difference is taken in
+        # DATE arithmetic (days), which is what the column holds; the CASTs keep it valid, to
+        # the second, if the column is ever a TIMESTAMP.
+        return ("(NVL2(t.UP_SINCE, 1, 0) <> NVL2(s.UP_SINCE, 1, 0)"
+                " OR ABS(CAST(t.UP_SINCE AS DATE) - CAST(s.UP_SINCE AS DATE)) * 86400 > 60)")
+    return f"DECODE(t.{column}, s.{column}, 0, 1) = 1"
+
+# Upsert keyed on (SW_ID, IFINDEX): one row per ONU. Only rows with a change are updated,
+# and within them only the changed columns take the new value; UDATE records the change.
+# Needs a unique key on (SW_ID, IFINDEX), see migrate_onu_ports.py: without it every
+# history row of an ONU matches, and MERGE fails with ORA-30926.
+MERGE_ONU_PORT_SQL = """
+MERGE INTO SWITCH_SNMP_ONU_PORTS t
+USING (SELECT :sw_id AS SW_ID, :ifindex AS IFINDEX, :mac AS MAC, :power AS POWER, :status AS STATUS,
+              :ifdescr AS IFDESCR, :portno AS PORTNO, :onu_port AS ONU_PORT, :pon_port AS PON_PORT,
+              :parent_id AS PARENT_ID, :slno AS SLNO, :distance AS DISTANCE, :up_since AS UP_SINCE,
+              :onu_model AS ONU_MODEL, :onu_vendor AS ONU_VENDOR, :ifindex2 AS IFINDEX2, :udate AS UDATE
+       FROM DUAL) s
+ON (t.SW_ID = s.SW_ID AND t.IFINDEX = s.IFINDEX)
+WHEN MATCHED THEN UPDATE SET
+    {set_clause},
+    t.UDATE = s.UDATE
+    WHERE {where_clause}
+WHEN NOT MATCHED THEN INSERT
+    (ID, PORT_ID, MAC, POWER, STATUS, IFDESCR, PORTNO, SW_ID, IFINDEX,
+    UDATE, ONU_PORT, PON_PORT, PARENT_ID, SLNO, DISTANCE, UP_SINCE, ONU_MODEL, ONU_VENDOR, IFINDEX2)
+    VALUES
+    (SWITCH_SNMP_ONU_PORTS_sq.nextval, NULL, s.MAC, s.POWER, s.STATUS, s.IFDESCR, s.PORTNO, s.SW_ID, s.IFINDEX,
+    s.UDATE, s.ONU_PORT, s.PON_PORT, s.PARENT_ID, s.SLNO, s.DISTANCE, s.UP_SINCE, s.ONU_MODEL, s.ONU_VENDOR, s.IFINDEX2)
+""".format(
+    set_clause=",\n    ".join([f"t.{column} = CASE WHEN {_merge_column_changed(column)} THEN s.{column} ELSE t.{column} END"
+                                for column in MERGE_COMPARED_COLUMNS + ['UP_SINCE']]),
+    where_clause="\n       OR ".join([_merge_column_changed(column) for column in MERGE_COMPARED_COLUMNS + ['UP_SINCE']]),
+)
+
+# Unique indexes on SWITCH_SNMP_ONU_PORTS made of exactly SW_ID and IFINDEX. USER_INDEXES only
+# covers the connected schema, which is the table the unqualified INSERT and MERGE write to.
+ONU_PORT_UNIQUE_KEY_SQL = """
+SELECT COUNT(*) FROM (
+    SELECT ic.INDEX_NAME
+    FROM USER_INDEXES i
+    JOIN USER_IND_COLUMNS ic ON ic.INDEX_NAME = i.INDEX_NAME
+    WHERE i.TABLE_NAME = 'SWITCH_SNMP_ONU_PORTS' AND i.UNIQUENESS = 'UNIQUE'
+    GROUP BY ic.INDEX_NAME
+    HAVING COUNT(*) = 2 AND SUM(CASE WHEN ic.COLUMN_NAME IN ('SW_ID', 'IFINDEX') THEN 1 ELSE 0 END) = 2
+)
+"""
+
+# Set once the unique key has been seen, so polls do not query the dictionary every time
+_onu_port_unique_key = False
+
+def has_onu_port_unique_key(cursor):
+    """True if SWITCH_SNMP_ONU_PORTS has the unique (SW_ID, IFINDEX) key that merge mode relies on"""
+    global _onu_port_unique_key
+    if not _onu_port_unique_key:
+        cursor.execute(ONU_PORT_UNIQUE_KEY_SQL)
+        _onu_port_unique_key = cursor.fetchone()[0] > 0
+    return _onu_port_unique_key
+
+# Function to insert data into Oracle database
+def insert_into_db(onu_data, ip, db_host, db_port, db_user, db_pass, db_sid, batch_size=None, merge=False):
+    """
+    Bulk write the parsed ONU data into SWITCH_SNMP_ONU_PORTS.
+
+    Rows are array-bound with executemany and committed once per batch_size
+    rows (DB_BATCH_SIZE, default 1000) instead of one nextval query, INSERT and
+    commit per ONU.
+
+    With merge=True each ONU is upserted on (SW_ID, IFINDEX) instead of appended,
+    so the table holds one row per ONU and unchanged ONUs are not rewritten.
+    Merge mode needs the unique (SW_ID, IFINDEX) key created by
+    migrate_onu_ports.py and writes nothing if it is missing. Once that key
+    exists an append would fail with ORA-00001 for every known ONU, so rows
+    are then merged even when merge is False.
+    """
+    batch_size = get_db_batch_size(batch_size)
+
+    try:
+        # Borrow a pooled connection instead of a new TCP+auth handshake per call
+        with db_connection(db_host, db_port, db_user, db_pass, db_sid) as connection:
+            cursor = connection.cursor()
+
+            if has_onu_port_unique_key(cursor):
+                if not merge:
+                    print("SWITCH_SNMP_ONU_PORTS has a unique (SW_ID, IFINDEX) key: merging instead of appending.")
+                    merge = True
+            elif merge:
+                print("Error: Merge mode needs a unique key on SWITCH_SNMP_ONU_PORTS (SW_ID, IFINDEX). "
+                      "Run migrate_onu_ports.py to move duplicate history rows to SWITCH_SNMP_ONU_PORTS_HIST and create it.")
+                return False
+            sql = MERGE_ONU_PORT_SQL if merge else INSERT_ONU_PORT_SQL
+
+            # Get the switch ID from the SWITCHES table based on IP address
+            sw_id = get_switch_id(cursor, ip)
             if sw_id:
                 print(f"Retrieved switch ID {sw_id} from SWITCHES table for IP {ip}")
             else:
                 print(f"Warning: No switch found with IP {ip} in SWITCHES table. SW_ID will be set to NULL.")
-        except cx_Oracle.DatabaseError as e:
-            error, = e.args
-            print(f"Error retrieving switch ID from SWITCHES table: {error.message}")
-            sw_id = None
-        
-        # Add SW_ID to each ONU record
-        for index, data in onu_data.items():
-            data['SW_ID'] = sw_id  # Add the retrieved SW_ID or None
-        
-        # Get the current timestamp for UDATE
-        current_time = datetime.now()
-        
-        # filter to check if the ONU is online by checking POWER is not None and STATUS is 1
-        # active_onu_data = {index: data for index, data in onu_data.items() if data.get('POWER') is not None and data.get('STATUS') == 1}
-        # if not onu_data:
-        #     print("No ONU records to insert. Exiting...")
-        #     return True
-        
-        # Process each ONU record
-        for index, data in onu_data.items():
-            # Get next ID from the sequence SWITCH_SNMP_ONU_PORTS_sq
-            cursor.execute("SELECT SWITCH_SNMP_ONU_PORTS_sq.nextval FROM DUAL")
-            _id = cursor.fetchone()[0]
-            # Set default values for missing fields
-            data.setdefault('MAC', None)
-            data.setdefault('POWER', None)
-            data.setdefault('STATUS', None)
-            data.setdefault('IFDESCR', None)
-            data.setdefault('PORTNO', None)
-            data.setdefault('IFINDEX', None)
-            data.setdefault('ONU_PORT', None)
-            data.setdefault('PON_PORT', None)
-            data.setdefault('PARENT_ID', None)
-            data.setdefault('SLNO', None)
-            data.setdefault('DISTANCE', None)
-            data.setdefault('UP_SINCE', None)
-            data.setdefault('ONU_MODEL', None)
-            data.setdefault('ONU_VENDOR', None)
-            data.setdefault('IFINDEX2', None)
-            
-            # Insert the record
-            cursor.execute("""
-            INSERT INTO SWITCH_SNMP_ONU_PORTS 
-            (ID, PORT_ID, MAC, POWER, STATUS, IFDESCR, PORTNO, SW_ID, IFINDEX, 
-            UDATE, ONU_PORT, PON_PORT, PARENT_ID, SLNO, DISTANCE, UP_SINCE, ONU_MODEL, ONU_VENDOR, IFINDEX2)
-            VALUES 
-            (:id, :port_id, :mac, :power, :status, :ifdescr, :portno, :sw_id, :ifindex,
-            :udate, :onu_port, :pon_port, :parent_id, :slno, :distance, :up_since, :onu_model, :onu_vendor, :ifindex2)
-            """, {
-                'id': _id,
-                'port_id': None,
-                'mac': data['MAC'],
-                'power': data['POWER'],
-                'status': data['STATUS'],
-                'ifdescr': data['IFDESCR'],
-                'portno': data['PORTNO'],
-                'sw_id': sw_id,
-                'ifindex': data['IFINDEX'],
-                'udate': current_time,
-                'onu_port': data['ONU_PORT'],
-                'pon_port': data['PON_PORT'],
-                'parent_id': data['PARENT_ID'],
-                'slno': data['SLNO'],
-                'distance': data['DISTANCE'],
-                'up_since': data['UP_SINCE'],
-                'onu_model': data['ONU_MODEL'],
-                'onu_vendor': data['ONU_VENDOR'],
-                'ifindex2': data['IFINDEX2']
-            })
-        
-            # Commit the transaction
-            connection.commit()
-            print(f"Inserted record for ONU {index} with ID {_id} with {sw_id}")
-            
-        print(f"Successfully inserted {len(onu_data)} ONU records into the database.")
-        
+                if merge:
+                    print("Warning: Rows with a NULL SW_ID never match in merge mode, so every ONU will be inserted again.")
+
+            # Get the current timestamp for UDATE
+            current_time = datetime.now()
+
+            # Bind types up front so a leading NULL does not fix the column type for the whole batch
+            cursor.setinputsizes(udate=cx_Oracle.DATETIME, up_since=cx_Oracle.DATETIME,
+                                 power=cx_Oracle.NUMBER, distance=cx_Oracle.NUMBER, status=cx_Oracle.NUMBER)
+
+            start_time = time.time()
+            rows = (_onu_port_row(data, sw_id, current_time) for data in onu_data.values())
+            written, affected = execute_batches(connection, cursor, sql, rows, batch_size)
+            elapsed_time = time.time() - start_time
+
+            rate = written / elapsed_time if elapsed_time > 0 else float(written)
+            if merge:
+                print(f"Successfully merged {written} ONU records for switch {sw_id} into the database "
+                      f"({affected} inserted or changed, {written - affected} unchanged) "
+                      f"in {elapsed_time:.2f} seconds ({rate:.0f} rows/s, batch size {batch_size}).")
+            else:
+                print(f"Successfully inserted {written} ONU records for switch {sw_id} into the database "
+                      f"in {elapsed_time:.2f} seconds ({rate:.0f} rows/s, batch size {batch_size}).")
+
     except cx_Oracle.DatabaseError as e:
         error, = e.args
         print(f"Database error: {error.message}")
         return False
-    finally:
-        # Close connection
-        if 'connection' in locals():
-            connection.close()
-    
+
     return True
 
-def insert_into_db_olt_customer_mac(onu_data, ip, db_host, db_port, db_user, db_pass, db_sid):
-    # Create DSN
-    dsn_tns = cx_Oracle.makedsn(db_host, db_port, sid=db_sid)
-    
+# Function to write one OLT's parsed ONU data, optionally only what changed since the last poll
+def store_onu_data(onu_data, ip, db_host, db_port, db_user, db_pass, db_sid, merge=False, delta=False, power_deadband=0.5):
+    """
+    Write parsed ONU data with insert_into_db, used by main.py and the poller.
+
+    With delta=True only ONUs that are new or changed since the OLT's stored
+    state are written, and the state is updated once the write succeeded.
+
+    Nothing is written when onu_data is None or empty: a failed or empty walk
+    would otherwise mark every stored ONU as removed and wipe the saved state,
+    so the next poll would rewrite every ONU.
+    """
+    if not onu_data:
+        print(f"No ONU data for {ip}, nothing written.")
+        return False
+
+    onu_rows = onu_data
+    if delta:
+        previous_state = load_onu_state(ip)
+        onu_diff = diff_onu_data(previous_state, onu_data, power_deadband)
+        onu_rows = {**onu_diff['new'], **onu_diff['changed']}
+        print(f"Change detection for {ip}: {summarize_diff(onu_diff)}.")
+
+    written = insert_into_db(onu_rows, ip, db_host, db_port, db_user, db_pass, db_sid, merge=merge)
+    if delta and written:
+        save_onu_state(ip, next_onu_state(previous_state, onu_diff))
+    return written
+
+INSERT_CUSTOMER_MAC_SQL = """
+INSERT {hint}INTO OLT_CUSTOMER_MAC
+(ID, OLT_ID, VLAN, PORT, MAC, UDATE)
+VALUES
+(OLT_CUSTOMER_MAC_sq.nextval, :olt_id, :vlan, :port, :mac, :udate)
+"""
+
+def insert_into_db_olt_customer_mac(onu_data, ip, db_host, db_port, db_user, db_pass, db_sid, batch_size=None, append_values=False):
+    """
+    Bulk insert learned customer MACs into OLT_CUSTOMER_MAC.
+
+    A pooled connection is borrowed per batch rather than for the whole call:
+    onu_data may be a stream still being read from a telnet session, and
+    holding a connection while waiting on it would starve the other sessions
+    (DB_POOL_MAX is normally below the telnet concurrency).
+
+    Args:
+        onu_data (iterable): MAC-table entries with 'VLAN', 'Port' and 'MAC' keys.
+        batch_size (int): Rows per executemany/commit (DB_BATCH_SIZE, default 1000).
+        append_values (bool): Add the APPEND_VALUES hint for a direct-path load.
+                              Faster for full refreshes, but it locks the table
+                              until each batch commits and always writes above
+                              the high-water mark.
+    """
+    batch_size = get_db_batch_size(batch_size)
+    sql = INSERT_CUSTOMER_MAC_SQL.format(hint="/*+ APPEND_VALUES */ " if append_values else "")
+
     try:
-        # Establish connection
-        connection = cx_Oracle.connect(db_user, db_pass, dsn_tns)
-        cursor = connection.cursor()
-        
-        print(f"Connected to Oracle Database.")
-        
         # Get the OLT ID from the SWITCHES table based on IP address
-        try:
-            cursor.execute("SELECT ID FROM SWITCHES WHERE IP = :ip", {"ip": ip})
-            result = cursor.fetchone()
-            olt_id = result[0] if result else None
-            if olt_id:
-                print(f"Retrieved OLT ID {olt_id} from SWITCHES table for IP {ip}")
-            else:
-                print(f"Warning: No OLT found with IP {ip} in SWITCHES table. SW_ID will be set to NULL.")
-        except cx_Oracle.DatabaseError as e:
-            error, = e.args
-            print(f"Error retrieving OLT ID from SWITCHES table: {error.message}")
-            olt_id = None
-        
-        # Add SW_ID to each ONU record
-        for index, data in enumerate(onu_data):
-            data['OLT_ID'] = olt_id  # Add the retrieved SW_ID or None
-        
+        with db_connection(db_host, db_port, db_user, db_pass, db_sid) as connection:
+            olt_id = get_switch_id(connection.cursor(), ip)
+        if olt_id:
+            print(f"Retrieved OLT ID {olt_id} from SWITCHES table for IP {ip}")
+        else:
+            print(f"Warning: No OLT found with IP {ip} in SWITCHES table. SW_ID will be set to NULL.")
+
         # Get the current timestamp for UDATE
         current_time = datetime.now()
-        
-        # Process each ONU record
-        for index, data in enumerate(onu_data):
-            # Get next ID from the sequence OLT_CUSTOMER_MAC_sq
-            cursor.execute("SELECT OLT_CUSTOMER_MAC_sq.nextval FROM DUAL")
-            _id = cursor.fetchone()[0]
-            # Set default values for missing fields
-            data.setdefault('OLT_ID', None)
-            data.setdefault('VLAN', None)
-            data.setdefault('Port', None)
-            data.setdefault('MAC', None)
-            data.setdefault('udate', None)
-            
-            # Insert the record
-            cursor.execute("""
-            INSERT INTO OLT_CUSTOMER_MAC 
-            (ID, OLT_ID, VLAN, PORT, MAC, UDATE)
-            VALUES 
-            (:id, :olt_id, :vlan, :port, :mac, :udate)
-            """, {
-                'id': _id,
-                'olt_id': data['OLT_ID'],
-                'vlan': data['VLAN'],
-                'port': data['Port'],
-                'mac': data['MAC'],
-                'udate': current_time
-            })
-        
-            # Commit the transaction
-            connection.commit()
-            print(f"Inserted record for ONU {index} with ID {_id} with {olt_id}")
-            
-        print(f"Successfully inserted {len(onu_data)} ONU records into the database.")
-        
+
+        start_time = time.time()
+        rows = ({
+            'olt_id': olt_id,
+            'vlan': data.get('VLAN'),
+            'port': data.get('Port'),
+            'mac': data.get('MAC'),
+            'udate': current_time
+        } for data in onu_data)
+        inserted = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with db_connection(db_host, db_port, db_user, db_pass, db_sid) as connection:
+                cursor = connection.cursor()
+                cursor.setinputsizes(udate=cx_Oracle.DATETIME)
+                cursor.executemany(sql, batch)
+                connection.commit()
+            inserted += len(batch)
+        elapsed_time = time.time() - start_time
+
+        rate = inserted / elapsed_time if elapsed_time > 0 else float(inserted)
+        print(f"Successfully inserted {inserted} customer MAC records for OLT {olt_id} into the database "
+              f"in {elapsed_time:.2f} seconds ({rate:.0f} rows/s, batch size {batch_size}"
+              f"{', direct-path' if append_values else ''}).")
+
     except cx_Oracle.DatabaseError as e:
         error, = e.args
         print(f"Database error: {error.message}")
         return False
-    finally:
-        # Close connection
-        if 'connection' in locals():
-            connection.close()
-    
-    return True
\ No newline at end of file
+
+    return True